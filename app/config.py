@@ -11,9 +11,70 @@ class Settings:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_CHAT_MODEL = "gpt-4.1-mini"
     OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+    RERANKER_MODEL = os.getenv(
+        "RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-12-v2"
+    )
+
+    # "openai" (default) or "local" (sentence-transformers on CPU)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+    LOCAL_EMBEDDING_MODEL = os.getenv(
+        "LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+    )
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    # 0 keeps the torch default thread count
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+    EMBEDDING_PROCESSES = int(os.getenv("EMBEDDING_PROCESSES", "1"))
 
     VECTOR_DB_DIR = Path(os.getenv("VECTOR_DB_DIR", "chroma_db"))
     UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploaded_docs"))
+    # Holds index.json, the document_id -> filename registry
+    INDEX_DIR = Path(os.getenv("INDEX_DIR", "index_db"))
+
+    # "chroma" (default) or "flat" (exact search over a memory-mapped file)
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+
+    # Chunks retrieved (across all requested documents) before reranking
+    RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "100"))
+    # Threads used to search several documents of one query concurrently
+    RETRIEVAL_FANOUT_WORKERS = int(os.getenv("RETRIEVAL_FANOUT_WORKERS", "8"))
+    # Most document_ids one query may search (more is rejected with 422)
+    MAX_QUERY_DOCUMENTS = int(os.getenv("MAX_QUERY_DOCUMENTS", "20"))
+
+    # Admission control: requests allowed into the worker threadpool at
+    # once. Checked on the event loop, so excess requests get a 429
+    # straight away instead of queueing for a thread
+    MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "32"))
+    # Concurrent calls and waiting callers per stage; keep each stage's
+    # sum below MAX_INFLIGHT_REQUESTS so its own queue limit can trigger
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+    EMBEDDING_QUEUE_SIZE = int(os.getenv("EMBEDDING_QUEUE_SIZE", "16"))
+    # The reranker is shared per process and its tokenizer is not
+    # thread-safe, so reranks run one at a time by default
+    RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", "1"))
+    RERANK_QUEUE_SIZE = int(os.getenv("RERANK_QUEUE_SIZE", "16"))
+    LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+    LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "16"))
+    # Seconds a request may wait for a stage before it is rejected
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+    # GET /snapshot needs "X-Admin-Token: <ADMIN_TOKEN>"; unset keeps
+    # snapshot export CLI-only (python -m app.maintenance)
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+    # Opt-in per-request profiling: when enabled, a /query or /documents
+    # request carrying "X-Profile: <PROFILE_TOKEN>" is sampled and its
+    # collapsed stacks are saved to PROFILE_DIR/<request id>.collapsed
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+    PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+    # Production server (python -m app.server): models load once in the
+    # parent and WORKERS forked processes share them copy-on-write.
+    # More than one worker needs VECTOR_STORE_BACKEND=flat
+    HOST = os.getenv("HOST", "127.0.0.1")
+    PORT = int(os.getenv("PORT", "8000"))
+    WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
 
 
 settings = Settings()
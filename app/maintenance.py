@@ -0,0 +1,81 @@
+# app/maintenance.py
+"""
+Offline maintenance commands for the vector store.
+
+Usage:
+    python -m app.maintenance compact
+    python -m app.maintenance snapshot-export snapshot.ragsnap [--float16]
+    python -m app.maintenance snapshot-import snapshot.ragsnap
+"""
+import argparse
+import json
+
+from app.config import settings
+
+
+def compact(args: argparse.Namespace) -> None:
+    from app.services.rag_service import RAGService
+
+    report = RAGService(args.vector_db_dir).compact()
+    print(json.dumps(report, indent=2))
+
+
+def snapshot_export(args: argparse.Namespace) -> None:
+    from app.services.rag_service import RAGService
+    from app.services.snapshot import export_snapshot
+
+    header = export_snapshot(
+        RAGService(args.vector_db_dir), args.path, float16=args.float16
+    )
+    header.pop("registry")
+    print(json.dumps(header, indent=2))
+
+
+def snapshot_import(args: argparse.Namespace) -> None:
+    from app.services.rag_service import RAGService
+    from app.services.snapshot import import_snapshot
+
+    report = import_snapshot(RAGService(args.vector_db_dir), args.path)
+    report.pop("registry")
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance")
+    parser.add_argument(
+        "--vector-db-dir",
+        default=str(settings.VECTOR_DB_DIR),
+        help="Vector store directory (defaults to VECTOR_DB_DIR).",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "compact",
+        help="Reclaim space left by deleted and re-indexed documents.",
+    ).set_defaults(func=compact)
+
+    export_parser = commands.add_parser(
+        "snapshot-export",
+        help="Write chunks, embeddings and the document registry to one file.",
+    )
+    export_parser.add_argument("path")
+    export_parser.add_argument(
+        "--float16",
+        action="store_true",
+        help="Store embeddings as float16 to halve the snapshot size.",
+    )
+    export_parser.set_defaults(func=snapshot_export)
+
+    import_parser = commands.add_parser(
+        "snapshot-import",
+        help="Verify a snapshot and bulk-load it into an empty vector store.",
+    )
+    import_parser.add_argument("path")
+    import_parser.set_defaults(func=snapshot_import)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+from app.config import settings
 
 
 class IngestResponse(BaseModel):
@@ -7,10 +9,28 @@ class IngestResponse(BaseModel):
     message: str
 
 
+class UpdateResponse(IngestResponse):
+    added: int
+    removed: int
+    unchanged: int
+
+
+class DeleteResponse(IngestResponse):
+    removed_chunks: int
+
+
 class QueryRequest(BaseModel):
     question: str
     document_id: Optional[str] = None
+    # Each id is a separate retrieval, so the list length is capped
+    document_ids: Optional[List[str]] = Field(
+        default=None, max_length=settings.MAX_QUERY_DOCUMENTS
+    )
     top_k: int = 4
+    # "full": sources + rerankedsources, "reranked": rerankedsources only,
+    # "answer": answer and confidence only
+    response_mode: Literal["full", "reranked", "answer"] = "full"
+    snippet_length: int = Field(default=300, ge=0, le=5000)
 
 class SourceDocument(BaseModel):
     document_id: Optional[str]
@@ -21,8 +41,8 @@ class QueryResponse(BaseModel):
     question: str
     answer: str
     confidence: float
-    sources: List[SourceDocument]
-    rerankedsources: List[SourceDocument]
+    sources: Optional[List[SourceDocument]] = None
+    rerankedsources: Optional[List[SourceDocument]] = None
 
 
 class DocumentItem(BaseModel):
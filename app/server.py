@@ -0,0 +1,168 @@
+# app/server.py
+"""
+Pre-fork production server.
+
+Usage:
+    python -m app.server [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+The parent imports the app and loads the tokenizer, reranker and local
+embedding weights once, binds the listening socket and then forks the
+workers, so model memory is shared copy-on-write rather than loaded per
+worker. Each worker opens its own vector store handle and serves the
+shared socket with uvicorn. Workers that die are restarted. Several
+workers need VECTOR_STORE_BACKEND=flat; with Chroma one is started.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before replacing a worker that exited
+RESTART_DELAY = 1.0
+
+
+def _set_torch_threads(count: int) -> None:
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, count))
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(sock: socket.socket, threads: int) -> None:
+    import uvicorn
+
+    import main
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    _set_torch_threads(threads)
+    uvicorn.Server(uvicorn.Config(main.app)).run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _serve(sock, threads)
+        except BaseException:
+            logger.exception("Worker %s crashed.", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _worker_count(requested: int) -> int:
+    """
+    Chroma keeps its index in process memory and never picks up other
+    processes' writes, so with that backend a single worker is started.
+    """
+    if requested > 1 and settings.VECTOR_STORE_BACKEND != "flat":
+        logger.warning(
+            "VECTOR_STORE_BACKEND=%s does not see writes made by other "
+            "workers; starting 1 worker instead of %d. Set "
+            "VECTOR_STORE_BACKEND=flat to serve with several workers.",
+            settings.VECTOR_STORE_BACKEND,
+            requested,
+        )
+        return 1
+    return max(1, requested)
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    workers = _worker_count(workers)
+    if not hasattr(os, "fork"):
+        raise RuntimeError(
+            "The pre-fork server needs os.fork; run `uvicorn main:app` instead."
+        )
+
+    # Torch's intra-op thread pool does not survive fork, so the parent
+    # stays single-threaded and each worker sizes its own pool below
+    _set_torch_threads(1)
+
+    import main
+    from app.services import workers as worker_info
+
+    main.rag_service.preload()
+    sock = _bind(host, port)
+    worker_info.SUPERVISOR_PID = os.getpid()
+
+    # Move everything loaded so far out of the collector's reach; its
+    # reference count updates would otherwise copy the shared pages
+    gc.collect()
+    gc.freeze()
+
+    threads = settings.EMBEDDING_THREADS or (os.cpu_count() or 1) // workers
+    children = {_spawn(sock, threads) for _ in range(workers)}
+    logger.info("Serving on %s:%s with %d workers.", host, port, workers)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            logger.warning(
+                "Worker %s exited with status %s; restarting.", pid, status
+            )
+            time.sleep(RESTART_DELAY)
+            # stop() may have run during the sleep; it only signals
+            # children that already exist, so do not fork another
+            if not stopping:
+                children.add(_spawn(sock, threads))
+
+    sock.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.server")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.WORKERS,
+        help="Worker processes (defaults to WORKERS, or the CPU count).",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# app/services/admission.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from app.config import settings
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a stage cannot admit more work. `status_code` is 429
+    when the wait queue is full and 503 when the queue-time deadline
+    passed; `retry_after` is a hint in whole seconds.
+    """
+
+    def __init__(self, stage: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{stage} stage {reason}; retry after {retry_after}s.")
+        self.stage = stage
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class StageLimiter:
+    """
+    Bounded concurrency for one pipeline stage (embedding, rerank, LLM).
+
+    At most `max_concurrency` callers run at once and at most
+    `max_queue` wait behind them. A caller that cannot start within
+    `queue_timeout` seconds gives up, so overload turns into fast
+    rejections instead of unbounded upstream calls and tail latency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        # Moving average of how long a slot is held, for Retry-After
+        self._avg_service = 1.0
+
+    def _retry_after(self) -> int:
+        backlog = (self._waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(self._avg_service * backlog))
+
+    @contextmanager
+    def slot(self):
+        start = time.monotonic()
+        with self._cond:
+            if (
+                self._in_flight >= self.max_concurrency
+                and self._waiting >= self.max_queue
+            ):
+                self._rejected += 1
+                raise AdmissionRejected(
+                    self.name, 429, self._retry_after(), "queue is full"
+                )
+
+            self._waiting += 1
+            deadline = start + self.queue_timeout
+            try:
+                while self._in_flight >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        raise AdmissionRejected(
+                            self.name, 503, self._retry_after(),
+                            "queue wait deadline exceeded",
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            waited = time.monotonic() - start
+            self._in_flight += 1
+            self._admitted += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                held = time.monotonic() - started
+                self._avg_service = 0.8 * self._avg_service + 0.2 * held
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": self._waiting,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "avg_wait_seconds": (
+                    self._total_wait / self._admitted if self._admitted else 0.0
+                ),
+                "max_wait_seconds": self._max_wait,
+            }
+
+
+limiters: Dict[str, StageLimiter] = {
+    # Entry gate for whole requests. With no queue, slot() never blocks,
+    # so it is safe to take on the event loop before run_in_threadpool
+    "request": StageLimiter(
+        "request",
+        settings.MAX_INFLIGHT_REQUESTS,
+        0,
+        settings.ADMISSION_QUEUE_TIMEOUT,
+    ),
+    "embedding": StageLimiter(
+        "embedding",
+        settings.EMBEDDING_CONCURRENCY,
+        settings.EMBEDDING_QUEUE_SIZE,
+        settings.ADMISSION_QUEUE_TIMEOUT,
+    ),
+    # Snapshot exports read the whole store; one at a time, no queue
+    "snapshot": StageLimiter("snapshot", 1, 0, settings.ADMISSION_QUEUE_TIMEOUT),
+    "rerank": StageLimiter(
+        "rerank",
+        settings.RERANK_CONCURRENCY,
+        settings.RERANK_QUEUE_SIZE,
+        settings.ADMISSION_QUEUE_TIMEOUT,
+    ),
+    "llm": StageLimiter(
+        "llm",
+        settings.LLM_CONCURRENCY,
+        settings.LLM_QUEUE_SIZE,
+        settings.ADMISSION_QUEUE_TIMEOUT,
+    ),
+}
+
+
+def admission_stats() -> Dict[str, dict]:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
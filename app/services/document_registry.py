@@ -0,0 +1,36 @@
+# app/services/document_registry.py
+import json
+import os
+from contextlib import contextmanager
+from typing import List
+
+from app.config import settings
+from app.services.file_lock import file_lock
+
+INDEX_PATH = settings.INDEX_DIR / "index.json"
+
+
+@contextmanager
+def index_lock():
+    """
+    Hold around every load_index() -> modify -> save_index() sequence
+    so concurrent workers do not overwrite each other's changes.
+    """
+    with file_lock(INDEX_PATH.with_suffix(".lock")):
+        yield
+
+
+def load_index() -> List[dict]:
+    if INDEX_PATH.exists():
+        with INDEX_PATH.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    return []
+
+
+def save_index(entries: List[dict]) -> None:
+    # Write then rename, so readers never see a half-written file
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = INDEX_PATH.with_suffix(f".{os.getpid()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_path, INDEX_PATH)
@@ -1,12 +1,149 @@
 # app/services/embedding_service.py
-from langchain_openai import OpenAIEmbeddings
+import atexit
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
 from app.config import settings
 
 
-def get_embedding_model():
+class EmbeddingModelMismatchError(ValueError):
+    """
+    Raised when a vector store was built with a different embedding
+    model than the one currently configured.
+    """
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Local CPU bi-encoder embeddings via sentence-transformers.
+
+    The model is loaded on first use. In-process encode() calls are
+    serialised with a lock because the fast tokenizers are not safe to
+    share between concurrent threads. Large ingestion batches can be
+    spread across a multi-process pool instead (EMBEDDING_PROCESSES > 1),
+    which has its own lock so queries are not stuck behind an ingestion.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 32,
+        num_threads: int = 0,
+        num_processes: int = 1,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.num_processes = num_processes
+
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._model = None
+        self._pool: Optional[dict] = None
+
+    def load(self) -> None:
+        """
+        Loads the model weights without running inference.
+        """
+        self._get_model()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    if self.num_threads > 0:
+                        import torch
+
+                        torch.set_num_threads(self.num_threads)
+                    self._model = SentenceTransformer(
+                        self.model_name, device="cpu"
+                    )
+        return self._model
+
+    def _get_pool(self) -> dict:
+        if self._pool is None:
+            self._pool = self._get_model().start_multi_process_pool(
+                ["cpu"] * self.num_processes
+            )
+            atexit.register(self.close)
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._get_model().stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        # Sort by length so each batch pads to a similar size
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+
+        use_pool = (
+            self.num_processes > 1
+            and len(texts) >= self.batch_size * self.num_processes
+        )
+        with self._pool_lock if use_pool else self._lock:
+            vectors = self._get_model().encode(
+                sorted_texts,
+                batch_size=self.batch_size,
+                pool=self._get_pool() if use_pool else None,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            )
+
+        embeddings: List[List[float]] = [None] * len(texts)
+        for position, i in enumerate(order):
+            embeddings[i] = vectors[position].tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            vector = self._get_model().encode(
+                text,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            )
+        return vector.tolist()
+
+
+def get_embedding_model_id() -> str:
+    """
+    Identifies the configured embedding model, e.g.
+    "openai:text-embedding-3-small". Stored alongside each
+    collection so vectors from different models are never mixed.
+    """
+    if settings.EMBEDDING_BACKEND == "local":
+        return f"local:{settings.LOCAL_EMBEDDING_MODEL}"
+    return f"openai:{settings.OPENAI_EMBEDDING_MODEL}"
+
+
+@lru_cache(maxsize=1)
+def _get_local_embedding_model() -> LocalEmbeddings:
+    return LocalEmbeddings(
+        model_name=settings.LOCAL_EMBEDDING_MODEL,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        num_threads=settings.EMBEDDING_THREADS,
+        num_processes=settings.EMBEDDING_PROCESSES,
+    )
+
+
+def get_embedding_model() -> Embeddings:
     """
     Returns an embedding model for Chroma.
     """
+    if settings.EMBEDDING_BACKEND == "local":
+        return _get_local_embedding_model()
+
+    from langchain_openai import OpenAIEmbeddings
+
     embedding = OpenAIEmbeddings(
         model=settings.OPENAI_EMBEDDING_MODEL,
         # dimensions=1536,  # optional override for text-embedding-3 models
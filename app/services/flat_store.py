@@ -0,0 +1,451 @@
+# app/services/flat_store.py
+import copy
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.services.file_lock import file_lock
+
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.f32"
+CHUNKS_FILE = "chunks.jsonl"
+WRITE_LOCK_FILE = "write.lock"
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+    argpartition keeps this O(n) for the few hundred rows of a document.
+    """
+    if k >= len(scores):
+        return np.argsort(-scores)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+class FlatVectorStore:
+    """
+    Exact (brute-force) vector store backed by an append-only float32 file.
+
+    Layout inside `directory`:
+      - embeddings.f32  raw row-major float32 vectors, L2-normalised
+      - chunks.jsonl    one {"text", "metadata"} line per row
+      - manifest.json   dimension, row count, embedding model id,
+                        file generation and per-document segments
+
+    Deleted or replaced documents only leave the manifest; compact()
+    rewrites the live rows into the next file generation.
+
+    Each document owns one or more contiguous row segments, so a search
+    scoped to a document is a single dot product over a slice of the
+    memory-mapped block. The file is opened read-only with np.memmap, so
+    several uvicorn workers share the same pages through the OS page cache.
+    """
+
+    def __init__(self, directory: Path | str):
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / MANIFEST_FILE
+
+        # _lock guards the cached manifest/memmap; _write_lock plus a
+        # file lock serialise writers across threads and worker processes
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._manifest: Optional[dict] = None
+        self._manifest_stamp: Optional[tuple] = None
+        self._matrix: Optional[np.memmap] = None
+        self._chunks: Optional[np.memmap] = None
+
+    # ------------------------------
+    #  Manifest
+    # ------------------------------
+    @contextmanager
+    def _writing(self):
+        with self._write_lock, file_lock(self.directory / WRITE_LOCK_FILE):
+            yield
+
+    def _empty_manifest(self) -> dict:
+        return {
+            "dim": None,
+            "rows": 0,
+            "dead_rows": 0,
+            "chunks_bytes": 0,
+            "generation": 0,
+            "embedding_model": None,
+            "documents": {},
+        }
+
+    def _read_manifest(self) -> dict:
+        """
+        Returns the current manifest, re-reading it only when another
+        writer (thread or worker process) has replaced it. Callers must
+        not mutate the returned dict.
+        """
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return self._empty_manifest()
+
+        # os.replace() gives every new manifest a fresh inode
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp != self._manifest_stamp:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+            self._manifest_stamp = stamp
+            self._matrix = None
+            self._chunks = None
+        return self._manifest
+
+    def _write_manifest(self, manifest: dict) -> None:
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _embeddings_path(self, manifest: dict) -> Path:
+        """
+        Compaction writes each generation to new files, so readers that
+        mapped an older generation never see rows move underneath them.
+        """
+        generation = manifest.get("generation", 0)
+        if generation == 0:
+            return self.directory / EMBEDDINGS_FILE
+        return self.directory / f"embeddings.{generation}.f32"
+
+    def _chunks_path(self, manifest: dict) -> Path:
+        generation = manifest.get("generation", 0)
+        if generation == 0:
+            return self.directory / CHUNKS_FILE
+        return self.directory / f"chunks.{generation}.jsonl"
+
+    def get_embedding_model_id(self) -> Optional[str]:
+        """
+        Returns the id of the embedding model that built this store,
+        or None if nothing has been written yet.
+        """
+        with self._lock:
+            return self._read_manifest().get("embedding_model")
+
+    def _get_matrix(self, manifest: dict) -> np.ndarray:
+        if manifest["rows"] == 0:
+            return np.empty((0, manifest["dim"] or 0), dtype=np.float32)
+        if self._matrix is None or self._matrix.shape[0] != manifest["rows"]:
+            self._matrix = np.memmap(
+                self._embeddings_path(manifest),
+                dtype=np.float32,
+                mode="r",
+                shape=(manifest["rows"], manifest["dim"]),
+            )
+        return self._matrix
+
+    def _get_chunks(self, manifest: dict) -> np.ndarray:
+        if manifest["chunks_bytes"] == 0:
+            return np.empty(0, dtype=np.uint8)
+        size = manifest["chunks_bytes"]
+        if self._chunks is None or self._chunks.shape[0] != size:
+            self._chunks = np.memmap(
+                self._chunks_path(manifest),
+                dtype=np.uint8,
+                mode="r",
+                shape=(size,),
+            )
+        return self._chunks
+
+    def _open_generation(self) -> Tuple[dict, np.ndarray, np.ndarray]:
+        """
+        Returns the manifest with its embeddings and chunks mapped. The
+        maps hold the files' inodes, so a compaction that unlinks them
+        afterwards does not affect the caller.
+        """
+        with self._lock:
+            try:
+                manifest = self._read_manifest()
+                matrix = self._get_matrix(manifest)
+                chunks = self._get_chunks(manifest)
+            except FileNotFoundError:
+                # Compaction swapped files between the manifest check and
+                # the open; its new manifest is already in place
+                self._manifest_stamp = None
+                manifest = self._read_manifest()
+                matrix = self._get_matrix(manifest)
+                chunks = self._get_chunks(manifest)
+        return manifest, matrix, chunks
+
+    # ------------------------------
+    #  Writes
+    # ------------------------------
+    def add(
+        self,
+        document_id: str,
+        texts: List[str],
+        metadatas: List[dict],
+        embeddings: List[List[float]],
+        embedding_model: Optional[str] = None,
+        replace: bool = False,
+    ) -> None:
+        """
+        Appends chunks for a document. With replace=True the document's
+        previous rows are dropped in the same manifest update, so readers
+        see either the old or the new version, never both.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Expected one embedding per chunk.")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        lines = b"".join(
+            json.dumps({"text": t, "metadata": m}).encode("utf-8") + b"\n"
+            for t, m in zip(texts, metadatas)
+        )
+
+        with self._writing():
+            with self._lock:
+                manifest = copy.deepcopy(self._read_manifest())
+
+            if manifest.get("embedding_model") is None:
+                manifest["embedding_model"] = embedding_model
+
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vectors.shape[1])
+            elif manifest["dim"] != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"the store dimension {manifest['dim']}."
+                )
+
+            row_offset = manifest["rows"]
+            meta_offset = manifest["chunks_bytes"]
+
+            # Truncate to the manifest so a half-finished append is discarded
+            self._append(
+                self._embeddings_path(manifest),
+                row_offset * manifest["dim"] * 4,
+                vectors.tobytes(),
+            )
+            self._append(self._chunks_path(manifest), meta_offset, lines)
+
+            if replace:
+                self._drop_document(manifest, document_id)
+            manifest["rows"] = row_offset + len(vectors)
+            manifest["chunks_bytes"] = meta_offset + len(lines)
+            manifest["documents"].setdefault(document_id, []).append(
+                [row_offset, len(vectors), meta_offset, len(lines)]
+            )
+            self._write_manifest(manifest)
+            if manifest.get("generation", 0):
+                self._remove_stale_files(manifest)
+
+    def _remove_stale_files(self, manifest: dict) -> None:
+        """
+        Deletes the files of earlier generations. Windows refuses to
+        delete a file that is still mapped, so those are left for the
+        next write or compaction to retry.
+        """
+        current = {self._embeddings_path(manifest), self._chunks_path(manifest)}
+        for pattern in ("embeddings*.f32", "chunks*.jsonl"):
+            for path in self.directory.glob(pattern):
+                if path in current:
+                    continue
+                try:
+                    path.unlink()
+                except PermissionError:
+                    pass
+
+    @staticmethod
+    def _append(path: Path, offset: int, data: bytes) -> None:
+        with path.open("ab") as f:
+            f.truncate(offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _drop_document(manifest: dict, document_id: str) -> int:
+        segments = manifest["documents"].pop(document_id, [])
+        removed = sum(count for _, count, _, _ in segments)
+        manifest["dead_rows"] = manifest.get("dead_rows", 0) + removed
+        return removed
+
+    def delete(self, document_id: str) -> int:
+        """
+        Removes a document from the manifest and returns how many chunks
+        it had. Its rows stay on disk until compact() runs.
+        """
+        with self._writing():
+            with self._lock:
+                manifest = copy.deepcopy(self._read_manifest())
+            removed = self._drop_document(manifest, document_id)
+            if removed:
+                self._write_manifest(manifest)
+        return removed
+
+    def compact(self) -> dict:
+        """
+        Rewrites only the live rows into a new generation of files and
+        deletes the old ones. Returns row and byte counts before/after.
+        """
+        with self._writing():
+            manifest, matrix, chunks = self._open_generation()
+            old_files = [
+                self._embeddings_path(manifest),
+                self._chunks_path(manifest),
+            ]
+            bytes_before = sum(
+                path.stat().st_size for path in old_files if path.exists()
+            )
+
+            compacted = copy.deepcopy(manifest)
+            compacted["generation"] = manifest.get("generation", 0) + 1
+            compacted["rows"] = 0
+            compacted["dead_rows"] = 0
+            compacted["chunks_bytes"] = 0
+            compacted["documents"] = {}
+
+            new_files = [
+                self._embeddings_path(compacted),
+                self._chunks_path(compacted),
+            ]
+            with new_files[0].open("wb") as emb_out, \
+                    new_files[1].open("wb") as chunks_out:
+                for document_id, segments in manifest["documents"].items():
+                    start_row = compacted["rows"]
+                    start_byte = compacted["chunks_bytes"]
+                    for start, count, meta_offset, meta_length in segments:
+                        emb_out.write(matrix[start:start + count].tobytes())
+                        chunks_out.write(self._read_chunks(
+                            chunks, meta_offset, meta_length, split=False
+                        ))
+                        compacted["rows"] += count
+                        compacted["chunks_bytes"] += meta_length
+                    compacted["documents"][document_id] = [[
+                        start_row,
+                        compacted["rows"] - start_row,
+                        start_byte,
+                        compacted["chunks_bytes"] - start_byte,
+                    ]]
+                for f in (emb_out, chunks_out):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self._write_manifest(compacted)
+            # Drop this instance's maps of the old generation; other
+            # readers keep theirs, which hold the old inodes alive
+            del matrix, chunks
+            with self._lock:
+                self._matrix = None
+                self._chunks = None
+            self._remove_stale_files(compacted)
+
+        return {
+            "rows_before": manifest["rows"],
+            "rows_after": compacted["rows"],
+            "bytes_before": bytes_before,
+            "bytes_after": sum(path.stat().st_size for path in new_files),
+        }
+
+    # ------------------------------
+    #  Reads
+    # ------------------------------
+    def _read_chunks(
+        self,
+        chunks: np.ndarray,
+        meta_offset: int,
+        meta_length: int,
+        split: bool = True,
+    ):
+        data = chunks[meta_offset:meta_offset + meta_length].tobytes()
+        return data.splitlines() if split else data
+
+    def get_document(self, document_id: str) -> List[Tuple[dict, np.ndarray]]:
+        """
+        Returns the stored ({"text", "metadata"}, vector) pairs of a
+        document, so unchanged chunks can be re-added without re-embedding.
+        """
+        manifest, matrix, chunks = self._open_generation()
+
+        rows = []
+        for start, count, meta_offset, meta_length in (
+            manifest["documents"].get(document_id, [])
+        ):
+            lines = self._read_chunks(chunks, meta_offset, meta_length)
+            for i, line in enumerate(lines):
+                rows.append((json.loads(line), np.array(matrix[start + i])))
+        return rows
+
+    def document_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._read_manifest()["documents"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            manifest = self._read_manifest()
+        return {
+            "documents": len(manifest["documents"]),
+            "rows": manifest["rows"],
+            "dead_rows": manifest.get("dead_rows", 0),
+        }
+
+    def search(
+        self,
+        query_embedding: List[float],
+        k: int = 4,
+        document_id: Optional[str] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Exact top-k cosine similarity search, optionally scoped to
+        one document. Returns (Document, score) pairs, best first.
+        """
+        manifest, matrix, chunks = self._open_generation()
+
+        if manifest["rows"] == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        if document_id is not None:
+            segments = manifest["documents"].get(document_id, [])
+        else:
+            segments = [
+                s for segs in manifest["documents"].values() for s in segs
+            ]
+        if not segments:
+            return []
+
+        scores = np.concatenate(
+            [matrix[start:start + count] @ query for start, count, _, _ in segments]
+        )
+        # End index of each segment inside the concatenated scores
+        bounds = np.cumsum([count for _, count, _, _ in segments])
+
+        results = []
+        chunk_lines = {}
+        for i in _top_k(scores, k):
+            seg = int(np.searchsorted(bounds, i, side="right"))
+            _, count, meta_offset, meta_length = segments[seg]
+            if seg not in chunk_lines:
+                chunk_lines[seg] = self._read_chunks(
+                    chunks, meta_offset, meta_length
+                )
+            row = int(i - (bounds[seg] - count))
+            record = json.loads(chunk_lines[seg][row])
+            results.append(
+                (
+                    Document(
+                        page_content=record["text"],
+                        metadata=record["metadata"],
+                    ),
+                    float(scores[i]),
+                )
+            )
+        return results
@@ -1,5 +1,4 @@
 # app/services/llm_service.py
-from langchain_openai import ChatOpenAI
 from app.config import settings
 
 
@@ -8,6 +7,8 @@ def get_llm():
     Returns a LangChain ChatOpenAI model for use in LCEL.
     OPENAI_API_KEY must be set in the environment.
     """
+    from langchain_openai import ChatOpenAI
+
     llm = ChatOpenAI(
         model=settings.OPENAI_CHAT_MODEL,
         temperature=0.5,
@@ -0,0 +1,112 @@
+# app/services/profiling.py
+import re
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Optional
+
+
+# Set by the profiling middleware for the duration of one request
+active_profiler: ContextVar[Optional["SamplingProfiler"]] = ContextVar(
+    "active_profiler", default=None
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for the threads serving one request.
+
+    A background thread records the stacks of registered threads every
+    `interval` seconds. Blocking calls (OpenAI requests, queue waits)
+    show up as well as CPU work. Output is in collapsed-stack format,
+    which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self._counts: Counter = Counter()
+        self._threads: set = set()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def add_thread(self, ident: int) -> None:
+        self._threads.add(ident)
+
+    def remove_thread(self, ident: int) -> None:
+        self._threads.discard(ident)
+
+    def start(self) -> None:
+        self._sampler = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self._threads):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self._counts[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self._counts.most_common()
+        )
+
+    def save(self, directory: Path, request_id: str) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{request_id}.collapsed"
+        path.write_text(self.collapsed(), encoding="utf-8")
+        return path
+
+
+def profiled(func):
+    """
+    Wraps a function run in the threadpool so the thread it runs on is
+    sampled while a request profile is active. A no-op lookup otherwise.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = active_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+
+        ident = threading.get_ident()
+        profiler.add_thread(ident)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.remove_thread(ident)
+
+    return wrapper
+
+
+def safe_request_id(value: Optional[str]) -> str:
+    """
+    Client-supplied ids become file names, so anything but a short
+    [A-Za-z0-9_-] string is replaced with a fresh uuid.
+    """
+    if value and re.fullmatch(r"[A-Za-z0-9_-]{1,64}", value):
+        return value
+    return str(uuid.uuid4())
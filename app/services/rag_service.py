@@ -1,25 +1,50 @@
 # app/services/rag_service.py
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import Optional
-from typing import List
+from typing import Optional, TYPE_CHECKING
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-
-from sentence_transformers import CrossEncoder
+from langchain_core.documents import Document
 
 from app.config import settings
 from app.services.llm_service import get_llm
-from app.services.embedding_service import get_embedding_model
+from app.services.embedding_service import (
+    EmbeddingModelMismatchError,
+    get_embedding_model,
+    get_embedding_model_id,
+)
+from app.services.flat_store import FlatVectorStore
+from app.services.admission import limiters
+from app.services.file_lock import file_lock
+from app.services.profiling import profiled
 
-import tiktoken
 import json
-
-tokenizer = tiktoken.get_encoding("cl100k_base")
+import pickle
+import shutil
+import threading
+import uuid
+
+# Chroma collection holding every chunk, and the temporary names a
+# compaction uses while it swaps in the rebuilt copy
+COLLECTION_NAME = "langchain"
+COMPACTING_SUFFIX = "-compacting"
+REPLACED_SUFFIX = "-replaced"
+
+# langchain_community, langchain_chroma (chromadb), sentence_transformers
+# (torch) and the tiktoken encoding are slow to load, so they are imported
+# on first use or during RAGService.warm_up() instead of at import time.
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
 
 prompt = PromptTemplate(
     template="""
@@ -44,35 +69,262 @@ prompt = PromptTemplate(
     input_variables=["context", "question"],
 )
 
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=1)
+def get_reranker():
+    """
+    Returns the shared CrossEncoder, loaded once per process.
+    """
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(settings.RERANKER_MODEL)
+
+
+def to_sources(docs: List[Document], snippet_length: int = 300) -> List[dict]:
+    return [
+        {
+            "document_id": doc.metadata.get("document_id"),
+            "page": doc.metadata.get("page"),
+            "snippet": doc.page_content[:snippet_length],  # limit for payload size
+        }
+        for doc in docs
+    ]
+
+
+def _directory_size(path: Path | str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _indexed_rows(persist_directory: Path | str, collection) -> int:
+    """
+    Rows in the collection's HNSW index, counting deleted entries that
+    still take space. Falls back to the live count until Chroma has
+    persisted the index metadata.
+    """
+    with sqlite3.connect(Path(persist_directory) / "chroma.sqlite3") as conn:
+        segments = conn.execute(
+            "SELECT id FROM segments WHERE collection = ? AND scope = 'VECTOR'",
+            (str(collection.id),),
+        ).fetchall()
+    for (segment_id,) in segments:
+        path = Path(persist_directory) / segment_id / "index_metadata.pickle"
+        if path.exists():
+            with path.open("rb") as f:
+                return pickle.load(f)["total_elements_added"]
+    return collection.count()
+
+
+def _find_collection(client, name: str):
+    from chromadb.errors import NotFoundError
+
+    try:
+        return client.get_collection(name)
+    except NotFoundError:
+        return None
+
+
+def _recover_compaction(client) -> None:
+    """
+    Finishes or rolls back a Chroma compaction that was interrupted.
+    Compaction renames the live collection to "<name>-replaced" before
+    the rebuilt copy, tagged with the id it was compacted from, takes
+    its name. "<name>-replaced" is only deleted once the collection
+    holding the name is confirmed to be that copy.
+    """
+    compacting = _find_collection(client, COLLECTION_NAME + COMPACTING_SUFFIX)
+    if compacting is not None:
+        client.delete_collection(compacting.name)
+
+    replaced = _find_collection(client, COLLECTION_NAME + REPLACED_SUFFIX)
+    if replaced is None:
+        return
+    current = _find_collection(client, COLLECTION_NAME)
+    if current is not None:
+        metadata = current.metadata or {}
+        if metadata.get("compacted_from") == str(replaced.id):
+            client.delete_collection(replaced.name)
+            return
+        if current.count():
+            raise RuntimeError(
+                f"Both '{COLLECTION_NAME}' and '{replaced.name}' hold chunks "
+                "after an interrupted compaction; resolve this manually."
+            )
+        client.delete_collection(current.name)
+    replaced.modify(name=COLLECTION_NAME)
+
+
 def count_tokens(text: str) -> int:
-    return len(tokenizer.encode(text))
+    return len(get_tokenizer().encode(text))
 
 class RAGService:
     def __init__(self, persist_directory: Path | str = settings.VECTOR_DB_DIR):
         self.persist_directory = str(persist_directory)
-        self.embedding_model = get_embedding_model()
-        self.llm = get_llm()
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.embedding_model_id = get_embedding_model_id()
+        self.ready = False
+        self.vector_backend = settings.VECTOR_STORE_BACKEND
+        self.flat_store = FlatVectorStore(Path(self.persist_directory) / "flat")
+        self._chroma_recovered = False
+        self._writer_state = threading.local()
+        self._retrieval_pool = ThreadPoolExecutor(
+            max_workers=settings.RETRIEVAL_FANOUT_WORKERS,
+            thread_name_prefix="retrieve",
+        )
+
+    @cached_property
+    def embedding_model(self):
+        return get_embedding_model()
+
+    @cached_property
+    def llm(self):
+        return get_llm()
+
+    @cached_property
+    def text_splitter(self):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        return RecursiveCharacterTextSplitter(
             chunk_size=200,
             chunk_overlap=20,
             length_function=count_tokens,
         )
 
-    def _get_vectordb(self) -> Chroma:
-        return Chroma(
-            embedding_function=self.embedding_model,
-            persist_directory=self.persist_directory,
-        )
+    def preload(self) -> None:
+        """
+        Loads everything the first request would otherwise pay for:
+        heavy imports, the tokenizer, the reranker and local embedding
+        weights. Opens no files or threads, so the pre-fork server runs
+        it once in the parent and every worker shares the weights.
+        """
+        from langchain_community.document_loaders import PyPDFLoader  # noqa: F401
+
+        get_tokenizer()
+        self.text_splitter
+        self.llm
+        if settings.EMBEDDING_BACKEND == "local":
+            self.embedding_model.load()
+        else:
+            self.embedding_model
+        get_reranker()
+
+    def warm_up(self) -> None:
+        """
+        Preloads models, then opens the vector store. Sets `ready` once done.
+        """
+        self.preload()
+        if self.vector_backend != "flat":
+            self._get_vectordb()
+        self.ready = True
+
+    def _get_vectordb(self, create: bool = False) -> Optional["Chroma"]:
+        """
+        Opens the Chroma collection. Reads never create it: they return
+        None before the first write, and read the previous collection
+        while a compaction swaps names. create=True (writes only) takes
+        the write lock, so it cannot run inside a compaction.
+        """
+        import chromadb
+        from chromadb.errors import NotFoundError
+        from langchain_chroma import Chroma
+
+        client = chromadb.PersistentClient(path=self.persist_directory)
+        if not self._chroma_recovered:
+            with self._chroma_writer():
+                _recover_compaction(client)
+            self._chroma_recovered = True
+
+        def open_collection(name: str, create: bool) -> "Chroma":
+            return Chroma(
+                client=client,
+                collection_name=name,
+                embedding_function=self.embedding_model,
+                collection_metadata={"embedding_model": self.embedding_model_id},
+                create_collection_if_not_exists=create,
+            )
 
-    def ingest_document(
+        if create:
+            with self._chroma_writer():
+                return open_collection(COLLECTION_NAME, create=True)
+        for name in (COLLECTION_NAME, COLLECTION_NAME + REPLACED_SUFFIX):
+            try:
+                return open_collection(name, create=False)
+            except NotFoundError:
+                continue
+        return None
+
+    @contextmanager
+    def _chroma_writer(self):
+        """
+        Chroma's persistent client does not coordinate writers in
+        separate processes, so every write holds a file lock in
+        VECTOR_DB_DIR (one writer at a time across all workers).
+        Re-entrant within a thread.
+        """
+        if getattr(self._writer_state, "held", False):
+            yield
+            return
+        with file_lock(Path(self.persist_directory) / "write.lock"):
+            self._writer_state.held = True
+            try:
+                yield
+            finally:
+                self._writer_state.held = False
+
+    def _check_embedding_model(self, recorded: Optional[str]) -> None:
+        if recorded is not None and recorded != self.embedding_model_id:
+            raise EmbeddingModelMismatchError(
+                f"Vector store was built with embedding model '{recorded}' "
+                f"but '{self.embedding_model_id}' is configured."
+            )
+
+    def stored_embedding_model_id(self) -> Optional[str]:
+        """
+        Returns the embedding model recorded in the vector store, or
+        None for an empty store or a collection that was never stamped.
+        """
+        if self.vector_backend == "flat":
+            return self.flat_store.get_embedding_model_id()
+        vectordb = self._get_vectordb()
+        if vectordb is None:
+            return None
+        return (vectordb._collection.metadata or {}).get("embedding_model")
+
+    def _check_chroma_embedding_model(
         self,
-        file_path: str,
-        document_id: Optional[str] = None,
-    ) -> str:
+        vectordb: "Chroma",
+        stamp: bool = False,
+    ) -> None:
+        """
+        Collections created before the embedding model was recorded
+        carry no metadata; they are stamped on the next ingestion.
+        """
+        metadata = vectordb._collection.metadata or {}
+        recorded = metadata.get("embedding_model")
+        self._check_embedding_model(recorded)
+        if stamp and recorded is None:
+            vectordb._collection.modify(
+                metadata={**metadata, "embedding_model": self.embedding_model_id}
+            )
+
+    def _split_document(self, file_path: str, doc_id: str) -> List[Document]:
+        from langchain_community.document_loaders import PyPDFLoader
+
         loader = PyPDFLoader(file_path)
         docs = loader.load()
 
-        doc_id = document_id or Path(file_path).stem
         for d in docs:
             d.metadata["document_id"] = doc_id
 
@@ -86,54 +338,469 @@ class RAGService:
                 "without a text layer."
             )
 
-        vectordb = self._get_vectordb()
-        vectordb.add_documents(chunks)
+        # Content-derived ids let a re-index skip chunks that did not change
+        occurrences = {}
+        for chunk in chunks:
+            digest = hashlib.sha1(
+                f"{chunk.metadata.get('page')}\0{chunk.page_content}".encode("utf-8")
+            ).hexdigest()[:16]
+            n = occurrences.get(digest, 0)
+            occurrences[digest] = n + 1
+            chunk.metadata["chunk_id"] = f"{doc_id}:{digest}:{n}"
 
-        return doc_id
+        return chunks
 
-    def query(
+    def ingest_document(
         self,
-        question: str,
+        file_path: str,
         document_id: Optional[str] = None,
-        k: int = 4,
     ) -> str:
+        doc_id = document_id or Path(file_path).stem
+        chunks = self._split_document(file_path, doc_id)
+
+        if self.vector_backend == "flat":
+            self._check_embedding_model(self.flat_store.get_embedding_model_id())
+            texts = [c.page_content for c in chunks]
+            with limiters["embedding"].slot():
+                embeddings = self.embedding_model.embed_documents(texts)
+            self.flat_store.add(
+                doc_id,
+                texts,
+                [c.metadata for c in chunks],
+                embeddings,
+                embedding_model=self.embedding_model_id,
+            )
+        else:
+            vectordb = self._get_vectordb()
+            if vectordb is not None:
+                self._check_chroma_embedding_model(vectordb)
+            self._chroma_upsert(chunks)
+
+        return doc_id
+
+    def _chroma_upsert(self, chunks: List[Document]) -> None:
+        """
+        Embeds the chunks, then writes them. Only the write holds the
+        cross-worker lock, so embedding calls on different workers
+        still run in parallel.
+        """
+        if not chunks:
+            return
+        texts = [c.page_content for c in chunks]
+        with limiters["embedding"].slot():
+            embeddings = self.embedding_model.embed_documents(texts)
+        with self._chroma_writer():
+            vectordb = self._get_vectordb(create=True)
+            self._check_chroma_embedding_model(vectordb, stamp=True)
+            vectordb._collection.upsert(
+                ids=[c.metadata["chunk_id"] for c in chunks],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[c.metadata for c in chunks],
+            )
+
+    def update_document(self, file_path: str, document_id: str) -> dict:
+        """
+        Re-ingests a document in place. Only chunks whose content changed
+        are embedded; chunks that no longer exist are removed.
+        Returns counts of added, removed and unchanged chunks.
+        """
+        chunks = self._split_document(file_path, document_id)
+        new_ids = [c.metadata["chunk_id"] for c in chunks]
+
+        if self.vector_backend == "flat":
+            self._check_embedding_model(self.flat_store.get_embedding_model_id())
+            existing = self.flat_store.get_document(document_id)
+            vectors = {
+                record["metadata"].get("chunk_id"): vector
+                for record, vector in existing
+            }
+            to_add = [c for c in chunks if c.metadata["chunk_id"] not in vectors]
+            removed = len(existing) - (len(chunks) - len(to_add))
+
+            if to_add:
+                with limiters["embedding"].slot():
+                    fresh = self.embedding_model.embed_documents(
+                        [c.page_content for c in to_add]
+                    )
+                for chunk, vector in zip(to_add, fresh):
+                    vectors[chunk.metadata["chunk_id"]] = vector
+
+            self.flat_store.add(
+                document_id,
+                [c.page_content for c in chunks],
+                [c.metadata for c in chunks],
+                [vectors[chunk_id] for chunk_id in new_ids],
+                embedding_model=self.embedding_model_id,
+                replace=True,
+            )
+        else:
+            vectordb = self._get_vectordb()
+            existing = set()
+            if vectordb is not None:
+                self._check_chroma_embedding_model(vectordb)
+                existing = set(
+                    vectordb.get(where={"document_id": document_id}, include=[])["ids"]
+                )
+            to_add = [c for c in chunks if c.metadata["chunk_id"] not in existing]
+
+            # Add before deleting so the document never disappears mid-update
+            self._chroma_upsert(to_add)
+            with self._chroma_writer():
+                # Re-read under the lock in case another worker changed it
+                vectordb = self._get_vectordb(create=True)
+                current = vectordb.get(
+                    where={"document_id": document_id}, include=[]
+                )["ids"]
+                stale = list(set(current) - set(new_ids))
+                if stale:
+                    vectordb.delete(ids=stale)
+            removed = len(stale)
+
+        return {
+            "added": len(to_add),
+            "removed": removed,
+            "unchanged": len(chunks) - len(to_add),
+        }
+
+    def delete_document(self, document_id: str) -> int:
+        """
+        Removes every chunk of a document and returns how many were removed.
+        """
+        if self.vector_backend == "flat":
+            return self.flat_store.delete(document_id)
+
+        with self._chroma_writer():
+            vectordb = self._get_vectordb()
+            if vectordb is None:
+                return 0
+            ids = vectordb.get(
+                where={"document_id": document_id}, include=[]
+            )["ids"]
+            if ids:
+                vectordb.delete(ids=ids)
+        return len(ids)
+
+    def iter_records(
+        self,
+        batch_size: int = 1000,
+    ) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[dict]]]:
+        """
+        Yields every stored chunk as (ids, embeddings, texts, metadatas)
+        batches. Used to export snapshots; pause ingestion for a
+        point-in-time copy.
+        """
+        if self.vector_backend == "flat":
+            for document_id in self.flat_store.document_ids():
+                rows = self.flat_store.get_document(document_id)
+                for i in range(0, len(rows), batch_size):
+                    batch = rows[i:i + batch_size]
+                    yield (
+                        [
+                            r["metadata"].get("chunk_id", f"{document_id}:{i + j}")
+                            for j, (r, _) in enumerate(batch)
+                        ],
+                        np.stack([v for _, v in batch]),
+                        [r["text"] for r, _ in batch],
+                        [r["metadata"] for r, _ in batch],
+                    )
+            return
+
+        vectordb = self._get_vectordb()
+        if vectordb is None:
+            return
+        collection = vectordb._collection
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            data = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            if not data["ids"]:
+                break
+            yield (
+                data["ids"],
+                np.asarray(data["embeddings"], dtype=np.float32),
+                data["documents"],
+                data["metadatas"],
+            )
+
+    def bulk_load(
+        self,
+        batches: Iterable[Tuple[List[str], np.ndarray, List[str], List[dict]]],
+        embedding_model_id: str,
+    ) -> int:
+        """
+        Writes pre-computed records into an empty vector store in
+        batches, without calling the embedding model. Returns the
+        number of chunks loaded.
+        """
+        self._check_embedding_model(embedding_model_id)
+        loaded = 0
+
+        if self.vector_backend == "flat":
+            if self.flat_store.stats()["rows"]:
+                raise ValueError("Snapshots can only be loaded into an empty store.")
+            for ids, embeddings, texts, metadatas in batches:
+                by_document = {}
+                for i, metadata in enumerate(metadatas):
+                    by_document.setdefault(metadata.get("document_id"), []).append(i)
+                for document_id, rows in by_document.items():
+                    self.flat_store.add(
+                        document_id,
+                        [texts[i] for i in rows],
+                        [metadatas[i] for i in rows],
+                        embeddings[rows],
+                        embedding_model=embedding_model_id,
+                    )
+                loaded += len(ids)
+            return loaded
+
+        with self._chroma_writer():
+            vectordb = self._get_vectordb(create=True)
+            collection = vectordb._collection
+            if collection.count():
+                raise ValueError("Snapshots can only be loaded into an empty store.")
+            max_batch = vectordb._client.get_max_batch_size()
+            for ids, embeddings, texts, metadatas in batches:
+                for i in range(0, len(ids), max_batch):
+                    collection.add(
+                        ids=ids[i:i + max_batch],
+                        embeddings=embeddings[i:i + max_batch],
+                        documents=texts[i:i + max_batch],
+                        metadatas=metadatas[i:i + max_batch],
+                    )
+                loaded += len(ids)
+        return loaded
+
+    def compact(self) -> dict:
+        """
+        Reclaims space left by deleted and replaced chunks in
+        VECTOR_DB_DIR. Best run while ingestion is paused.
+        """
+        if self.vector_backend == "flat":
+            return self.flat_store.compact()
+
+        name = COLLECTION_NAME
+        compacting_name = f"{name}{COMPACTING_SUFFIX}"
+        replaced_name = f"{name}{REPLACED_SUFFIX}"
+
+        with self._chroma_writer():
+            vectordb = self._get_vectordb()
+            if vectordb is None:
+                size = _directory_size(self.persist_directory)
+                return {
+                    "rows_before": 0,
+                    "rows_after": 0,
+                    "bytes_before": size,
+                    "bytes_after": size,
+                }
+            client = vectordb._client
+            collection = vectordb._collection
+            bytes_before = _directory_size(self.persist_directory)
+            rows_before = _indexed_rows(self.persist_directory, collection)
+            live_rows = collection.count()
+
+            # Deleted HNSW entries are never reclaimed in place, so copy
+            # the live records page by page into a fresh collection
+            if _find_collection(client, compacting_name) is not None:
+                client.delete_collection(compacting_name)
+            # The tag lets _recover_compaction() recognise the finished copy
+            compacted = client.create_collection(
+                compacting_name,
+                metadata={
+                    **(collection.metadata or {}),
+                    "compacted_from": str(collection.id),
+                },
+            )
+            batch_size = client.get_max_batch_size()
+            for offset in range(0, live_rows, batch_size):
+                page = collection.get(
+                    limit=batch_size,
+                    offset=offset,
+                    include=["embeddings", "documents", "metadatas"],
+                )
+                compacted.add(
+                    ids=page["ids"],
+                    embeddings=page["embeddings"],
+                    documents=page["documents"],
+                    metadatas=page["metadatas"],
+                )
+            copied = compacted.count()
+            if copied != live_rows:
+                client.delete_collection(compacting_name)
+                raise RuntimeError(
+                    f"Compaction copied {copied} of {live_rows} chunks; "
+                    "the store was left unchanged."
+                )
+
+            # Rename the old collection aside before the copy takes its
+            # name, so a crash at any point leaves one of them complete
+            # for _recover_compaction() to restore
+            collection.modify(name=replaced_name)
+            try:
+                compacted.modify(name=name)
+            except Exception:
+                collection.modify(name=name)
+                client.delete_collection(compacting_name)
+                raise
+            client.delete_collection(replaced_name)
+
+            sqlite_path = Path(self.persist_directory) / "chroma.sqlite3"
+            with sqlite3.connect(sqlite_path) as conn:
+                live_segments = {
+                    row[0] for row in conn.execute("SELECT id FROM segments")
+                }
+            # Chroma leaves the deleted collection's HNSW files behind
+            for path in Path(self.persist_directory).iterdir():
+                if (
+                    path.is_dir()
+                    and _is_uuid(path.name)
+                    and path.name not in live_segments
+                ):
+                    shutil.rmtree(path, ignore_errors=True)
+
+            with sqlite3.connect(sqlite_path) as conn:
+                conn.execute("VACUUM")
+
+            rows_after = _indexed_rows(self.persist_directory, compacted)
+            bytes_after = _directory_size(self.persist_directory)
+
+        return {
+            "rows_before": rows_before,
+            "rows_after": rows_after,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+        }
+
+    def _embed_query(self, question: str) -> List[float]:
+        """
+        Embeds the question once so every per-document search
+        in a fan-out reuses the same vector.
+        """
+        if self.vector_backend == "flat":
+            self._check_embedding_model(self.flat_store.get_embedding_model_id())
+        else:
+            vectordb = self._get_vectordb()
+            if vectordb is not None:
+                self._check_chroma_embedding_model(vectordb)
+        with limiters["embedding"].slot():
+            return self.embedding_model.embed_query(question)
+
+    def _retrieve(
+        self,
+        query_embedding: List[float],
+        document_id: Optional[str] = None,
+        k: int = 100,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Returns the k nearest chunks from the configured vector store
+        as (Document, score) pairs, best first.
+        """
+        if self.vector_backend == "flat":
+            return self.flat_store.search(
+                query_embedding,
+                k=k,
+                document_id=document_id,
+            )
+
         vectordb = self._get_vectordb()
+        if vectordb is None:
+            return []
+
+        search_kwargs = {"k": k}
 
-        search_kwargs = {"k": 100}
-        
         if document_id:
             search_kwargs["filter"] = {"document_id": document_id}
 
+        # Chroma returns distances; negate so higher is better
+        return [
+            (doc, -distance)
+            for doc, distance in
+            vectordb.similarity_search_by_vector_with_relevance_scores(
+                query_embedding, **search_kwargs
+            )
+        ]
+
+    def _retrieve_many(
+        self,
+        query_embedding: List[float],
+        document_ids: List[str],
+        k: int = 100,
+    ) -> List[Document]:
+        """
+        Searches each document concurrently and merges the candidates
+        into one list of at most k chunks, ordered by vector score.
+        """
+        if len(document_ids) <= 1:
+            document_id = document_ids[0] if document_ids else None
+            return [
+                doc for doc, _ in
+                self._retrieve(query_embedding, document_id, k=k)
+            ]
+
+        # Pool threads do not inherit context variables, so each search
+        # runs in a copy of the caller's to keep request profiling active
+        retrieve = profiled(
+            lambda doc_id: self._retrieve(query_embedding, doc_id, k=k)
+        )
+        futures = [
+            self._retrieval_pool.submit(
+                contextvars.copy_context().run, retrieve, doc_id
+            )
+            for doc_id in document_ids
+        ]
+        merged = [pair for future in futures for pair in future.result()]
+        merged.sort(key=lambda pair: pair[1], reverse=True)
+        return [doc for doc, _ in merged[:k]]
+
+    def query(
+        self,
+        question: str,
+        document_id: Optional[str] = None,
+        k: int = 4,
+        document_ids: Optional[List[str]] = None,
+        response_mode: str = "full",
+        snippet_length: int = 300,
+    ) -> dict:
+        """
+        Answers the question from the requested documents.
+
+        response_mode controls which source lists are returned:
+        "full" (sources and rerankedsources), "reranked" (rerankedsources
+        only) or "answer" (neither).
+        """
+        # Single document_id and document_ids may be combined
+        scope = list(dict.fromkeys(
+            ([document_id] if document_id else []) + (document_ids or [])
+        ))
+
         # Retrieve
-        docs = vectordb.similarity_search(question, **search_kwargs)
+        docs = self._retrieve_many(
+            self._embed_query(question),
+            scope,
+            k=settings.RETRIEVAL_CANDIDATES,
+        )
 
         if not docs:
-            return {"answer": "I don't know", "confidence": 0.0}
-
-        sources = []
-        for doc in docs:
-            sources.append({
-                "document_id": doc.metadata.get("document_id"),
-                "page": doc.metadata.get("page"),
-                "snippet": doc.page_content[:300]  # limit for payload size
-            })
+            return self._shape_result(
+                question, "I don't know", 0.0, [], [], response_mode,
+                snippet_length,
+            )
+
         # Rerank
-        reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-12-v2")
+        reranker = get_reranker()
         pairs = [(question, d.page_content) for d in docs]
-        scores = reranker.predict(pairs)
+        with limiters["rerank"].slot():
+            scores = reranker.predict(pairs)
 
         reranked_docs = [
-            doc for _, doc in sorted(zip(scores, docs), reverse=True)
+            doc for _, doc in sorted(
+                zip(scores, docs), key=lambda pair: pair[0], reverse=True
+            )
         ][:k]
 
-        rerankedsources = []
-        for doc in reranked_docs:
-            rerankedsources.append({
-                "document_id": doc.metadata.get("document_id"),
-                "page": doc.metadata.get("page"),
-                "snippet": doc.page_content[:300]  # limit for payload size
-            })
-
         context = "\n\n".join(d.page_content for d in reranked_docs)
 
         chain = (
@@ -146,17 +813,42 @@ class RAGService:
             | StrOutputParser()
         )
 
-        answer = chain.invoke(question)
+        with limiters["llm"].slot():
+            answer = chain.invoke(question)
 
         parsed = json.loads(answer)
 
-        return {
+        return self._shape_result(
+            question,
+            parsed.get("answer"),
+            parsed.get("confidence"),
+            docs,
+            reranked_docs,
+            response_mode,
+            snippet_length,
+        )
+
+    @staticmethod
+    def _shape_result(
+        question: str,
+        answer: Optional[str],
+        confidence: Optional[float],
+        docs: List[Document],
+        reranked_docs: List[Document],
+        response_mode: str,
+        snippet_length: int,
+    ) -> dict:
+        result = {
             "question": question,
-            "answer": parsed.get("answer"),
-            "confidence": parsed.get("confidence"),
-            "sources": sources,
-            "rerankedsources": rerankedsources
+            "answer": answer,
+            "confidence": confidence,
         }
+        # Only build the source lists the caller asked for
+        if response_mode == "full":
+            result["sources"] = to_sources(docs, snippet_length)
+        if response_mode in ("full", "reranked"):
+            result["rerankedsources"] = to_sources(reranked_docs, snippet_length)
+        return result
     
 
 
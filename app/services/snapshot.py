@@ -0,0 +1,215 @@
+# app/services/snapshot.py
+"""
+Single-file vector store snapshots for bootstrapping replicas.
+
+File layout:
+    8 bytes   magic b"RAGSNAP\\0"
+    4 bytes   header length (little-endian uint32)
+    header    JSON: format version, dtype, dimension, record count,
+              embedding model, document registry, section sizes and
+              the sha256 of everything after the header
+    section   embeddings, row-major float32 or float16
+    section   zlib-compressed JSON lines: {"id", "text", "metadata"}
+"""
+import hashlib
+import json
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.document_registry import index_lock, load_index, save_index
+
+MAGIC = b"RAGSNAP\0"
+FORMAT_VERSION = 1
+READ_SIZE = 1 << 20
+
+
+class SnapshotError(ValueError):
+    """
+    Raised for unreadable, corrupt or incompatible snapshot files.
+    """
+
+
+def export_snapshot(rag_service, path: Path | str, float16: bool = False) -> dict:
+    """
+    Writes every chunk, its metadata and embedding plus the document
+    registry to `path`. Returns the snapshot header.
+    """
+    path = Path(path)
+    # Label the snapshot with the model that built the stored vectors;
+    # a store the configured model does not match is refused
+    embedding_model = rag_service.stored_embedding_model_id()
+    rag_service._check_embedding_model(embedding_model)
+
+    dtype = np.float16 if float16 else np.float32
+    digest = hashlib.sha256()
+    compressor = zlib.compressobj(level=6)
+    count = 0
+    dim: Optional[int] = None
+
+    with tempfile.TemporaryDirectory(dir=path.parent) as tmp:
+        emb_path = Path(tmp) / "embeddings"
+        rec_path = Path(tmp) / "records"
+        with emb_path.open("wb") as emb_out, rec_path.open("wb") as rec_out:
+            for ids, embeddings, texts, metadatas in rag_service.iter_records():
+                dim = embeddings.shape[1]
+                emb_out.write(embeddings.astype(dtype).tobytes())
+                lines = b"".join(
+                    json.dumps(
+                        {"id": i, "text": t, "metadata": m}
+                    ).encode("utf-8") + b"\n"
+                    for i, t, m in zip(ids, texts, metadatas)
+                )
+                rec_out.write(compressor.compress(lines))
+                count += len(ids)
+            rec_out.write(compressor.flush())
+
+        # Checksum both sections in file order
+        for section in (emb_path, rec_path):
+            with section.open("rb") as f:
+                while chunk := f.read(READ_SIZE):
+                    digest.update(chunk)
+
+        header = {
+            "format_version": FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "dtype": np.dtype(dtype).name,
+            "dim": dim,
+            "count": count,
+            "embedding_model": embedding_model or rag_service.embedding_model_id,
+            "registry": load_index(),
+            "embeddings_bytes": emb_path.stat().st_size,
+            "records_bytes": rec_path.stat().st_size,
+            "sha256": digest.hexdigest(),
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+
+        tmp_out = Path(tmp) / "snapshot"
+        with tmp_out.open("wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<I", len(header_bytes)))
+            out.write(header_bytes)
+            for section in (emb_path, rec_path):
+                with section.open("rb") as f:
+                    shutil.copyfileobj(f, out, READ_SIZE)
+        tmp_out.replace(path)
+
+    return header
+
+
+def read_header(path: Path | str) -> Tuple[dict, int]:
+    """
+    Returns the snapshot header and the byte offset where data starts.
+    """
+    with Path(path).open("rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"{path} is not a vector store snapshot.")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+
+    if header.get("format_version") != FORMAT_VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot format version {header.get('format_version')}."
+        )
+    return header, len(MAGIC) + 4 + length
+
+
+def verify_snapshot(path: Path | str) -> dict:
+    header, data_offset = read_header(path)
+    digest = hashlib.sha256()
+    size = 0
+    with Path(path).open("rb") as f:
+        f.seek(data_offset)
+        while chunk := f.read(READ_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+
+    if size != header["embeddings_bytes"] + header["records_bytes"]:
+        raise SnapshotError("Snapshot is truncated.")
+    if digest.hexdigest() != header["sha256"]:
+        raise SnapshotError("Snapshot checksum mismatch.")
+    return header
+
+
+def _iter_batches(
+    path: Path,
+    header: dict,
+    data_offset: int,
+    batch_size: int,
+) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[dict]]]:
+    dtype = np.dtype(header["dtype"])
+    dim = header["dim"]
+
+    with path.open("rb") as emb_in, path.open("rb") as rec_in:
+        emb_in.seek(data_offset)
+        rec_in.seek(data_offset + header["embeddings_bytes"])
+        decompressor = zlib.decompressobj()
+        remaining = header["records_bytes"]
+        pending = b""
+        records: List[dict] = []
+
+        def take(n: int):
+            vectors = np.frombuffer(
+                emb_in.read(n * dim * dtype.itemsize), dtype=dtype
+            ).reshape(n, dim).astype(np.float32)
+            batch = records[:n]
+            del records[:n]
+            return (
+                [r["id"] for r in batch],
+                vectors,
+                [r["text"] for r in batch],
+                [r["metadata"] for r in batch],
+            )
+
+        while remaining:
+            chunk = rec_in.read(min(READ_SIZE, remaining))
+            remaining -= len(chunk)
+            pending += decompressor.decompress(chunk)
+            *lines, pending = pending.split(b"\n")
+            records.extend(json.loads(line) for line in lines)
+            while len(records) >= batch_size:
+                yield take(batch_size)
+
+        pending += decompressor.flush()
+        records.extend(json.loads(line) for line in pending.split(b"\n") if line)
+        if records:
+            yield take(len(records))
+
+
+def import_snapshot(rag_service, path: Path | str, batch_size: int = 1000) -> dict:
+    """
+    Verifies a snapshot and bulk-loads it into the (empty) vector store
+    behind `rag_service`, then restores missing registry entries.
+    Returns the snapshot header with the number of chunks loaded.
+    """
+    path = Path(path)
+    header = verify_snapshot(path)
+    _, data_offset = read_header(path)
+
+    loaded = 0
+    if header["count"]:
+        loaded = rag_service.bulk_load(
+            _iter_batches(path, header, data_offset, batch_size),
+            header["embedding_model"],
+        )
+    if loaded != header["count"]:
+        raise SnapshotError(
+            f"Loaded {loaded} chunks but the snapshot lists {header['count']}."
+        )
+
+    with index_lock():
+        index = load_index()
+        known = {item["document_id"] for item in index}
+        index.extend(
+            item for item in header["registry"]
+            if item["document_id"] not in known
+        )
+        save_index(index)
+
+    return {**header, "loaded": loaded}
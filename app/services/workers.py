@@ -0,0 +1,78 @@
+# app/services/workers.py
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# Set by app.server in the parent before forking, so every worker knows
+# which process to ask for its siblings. None under plain uvicorn.
+SUPERVISOR_PID: Optional[int] = None
+
+_SMAPS_FIELDS = {
+    "Rss:": "rss_bytes",
+    "Pss:": "pss_bytes",
+    "Shared_Clean:": "shared_bytes",
+    "Shared_Dirty:": "shared_bytes",
+}
+
+
+def process_memory(pid: int) -> Optional[dict]:
+    """
+    Resident, proportional and shared memory of `pid` in bytes. Pss
+    splits each shared page between the processes mapping it, so the
+    Pss of all workers adds up to their real footprint. Returns None
+    if the process is gone.
+    """
+    try:
+        lines = Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()
+    except FileNotFoundError:
+        if pid != os.getpid() or sys.platform.startswith("linux"):
+            return None
+        memory = {"rss_bytes": None, "pss_bytes": None, "shared_bytes": None}
+        try:
+            import resource
+        except ImportError:  # Windows
+            return memory
+        # No /proc (macOS): only the peak RSS of this process is known
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["rss_bytes"] = peak * (1 if sys.platform == "darwin" else 1024)
+        return memory
+
+    memory = {"rss_bytes": 0, "pss_bytes": 0, "shared_bytes": 0}
+    for line in lines:
+        field, _, rest = line.partition(" ")
+        if field in _SMAPS_FIELDS:
+            memory[_SMAPS_FIELDS[field]] += int(rest.split()[0]) * 1024
+    return memory
+
+
+def worker_pids() -> List[int]:
+    """
+    Pids of every worker forked by app.server, or just this process.
+    """
+    if SUPERVISOR_PID is None:
+        return [os.getpid()]
+    try:
+        children = Path(
+            f"/proc/{SUPERVISOR_PID}/task/{SUPERVISOR_PID}/children"
+        ).read_text()
+    except OSError:
+        return [os.getpid()]
+    return sorted(int(pid) for pid in children.split())
+
+
+def worker_report() -> dict:
+    processes = []
+    for pid in worker_pids():
+        memory = process_memory(pid)
+        if memory is not None:
+            processes.append({"pid": pid, **memory})
+
+    pss = [p["pss_bytes"] for p in processes]
+    return {
+        "workers": len(processes),
+        "pid": os.getpid(),
+        "supervisor_pid": SUPERVISOR_PID,
+        "total_pss_bytes": sum(pss) if None not in pss else None,
+        "processes": processes,
+    }
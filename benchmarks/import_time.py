@@ -0,0 +1,62 @@
+# benchmarks/import_time.py
+"""
+Measures how long `import main` takes in a fresh interpreter and which
+heavy libraries it pulls in.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "chromadb",
+    "langchain_community",
+    "langchain_openai",
+    "tiktoken",
+]
+
+PROBE = f"""
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(elapsed, len(sys.modules), ",".join(loaded), sep="|")
+"""
+
+
+def run_once() -> tuple:
+    env = {**os.environ, "PYTHONWARNINGS": "ignore"}
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    output = subprocess.check_output(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, text=True
+    )
+    elapsed, modules, loaded = output.strip().splitlines()[-1].split("|")
+    return float(elapsed), int(modules), loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    times = [r[0] for r in results]
+
+    print(f"import main: median {statistics.median(times):.3f}s "
+          f"(min {min(times):.3f}s, max {max(times):.3f}s, runs {args.runs})")
+    print(f"modules loaded: {results[-1][1]}")
+    print(f"heavy modules loaded: {results[-1][2] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
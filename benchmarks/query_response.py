@@ -0,0 +1,65 @@
+# benchmarks/query_response.py
+"""
+Compares /query payload size and serialisation time for each response
+mode, using Pydantic (the previous path) and orjson (FastJSONResponse).
+
+Usage:
+    python benchmarks/query_response.py [--sources 100] [--repeat 200]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.models import QueryResponse  # noqa: E402
+
+
+def build_result(n_sources: int, snippet_length: int, mode: str) -> dict:
+    source = {
+        "document_id": "f32e5b4c-1234-4daf-b211-f1a2e54398fa",
+        "page": 12,
+        "snippet": ("lorem ipsum dolor sit amet " * 20)[:snippet_length],
+    }
+    result = {
+        "question": "What is the summary of the first chapter?",
+        "answer": "The first chapter introduces the main concepts.",
+        "confidence": 0.82,
+    }
+    if mode == "full":
+        result["sources"] = [dict(source) for _ in range(n_sources)]
+    if mode in ("full", "reranked"):
+        result["rerankedsources"] = [dict(source) for _ in range(4)]
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sources", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [("full", 300), ("full", 120), ("reranked", 300), ("answer", 300)]
+    for mode, snippet_length in cases:
+        result = build_result(args.sources, snippet_length, mode)
+
+        def pydantic_path():
+            return QueryResponse(**result).model_dump_json().encode()
+
+        def orjson_path():
+            return orjson.dumps(result)
+
+        pydantic_us = timeit.timeit(pydantic_path, number=args.repeat) / args.repeat * 1e6
+        orjson_us = timeit.timeit(orjson_path, number=args.repeat) / args.repeat * 1e6
+        print(
+            f"{mode:>8} snippet={snippet_length:<3} "
+            f"bytes={len(orjson_path()):>6}  "
+            f"pydantic={pydantic_us:8.1f}us  orjson={orjson_us:7.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
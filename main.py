@@ -1,24 +1,85 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pathlib import Path
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.background import BackgroundTask
+from anyio import to_thread
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import logging
+import os
+import tempfile
 import uuid
+import orjson
 
 from app.models import (
     IngestResponse,
+    UpdateResponse,
+    DeleteResponse,
     QueryRequest,
     QueryResponse,
     DocumentItem,
 )
 
 from app.services.rag_service import RAGService
-from typing import List
-import json
+from app.services.embedding_service import EmbeddingModelMismatchError
+from app.services.document_registry import index_lock, load_index, save_index
+from app.services.snapshot import export_snapshot
+from app.services.admission import AdmissionRejected, admission_stats, limiters
+from app.services.workers import worker_report
+from app.services.profiling import (
+    SamplingProfiler,
+    active_profiler,
+    profiled,
+    safe_request_id,
+)
+from app.config import settings
+from typing import List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Threads beyond MAX_INFLIGHT_REQUESTS for sync endpoints and registry
+# writes, so gated work can never exhaust the pool
+THREADPOOL_HEADROOM = 8
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Serialises with orjson. Endpoints returning this directly skip the
+    response_model pass, so they must build content in the documented shape.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+async def _warm_up() -> None:
+    try:
+        await run_in_threadpool(rag_service.warm_up)
+    except Exception:
+        logger.exception("Warm-up failed; /health/ready stays unavailable.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = (
+        settings.MAX_INFLIGHT_REQUESTS + THREADPOOL_HEADROOM
+    )
+    # Warm up in the background so the process answers liveness probes
+    # while models load; readiness flips once warm_up() completes.
+    app.state.warm_up_task = asyncio.create_task(_warm_up())
+    yield
+    app.state.warm_up_task.cancel()
 
 
 app = FastAPI(
     title="Document RAG Q&A Service",
     version="0.1.0",
     description="Backend service for document ingestion and RAG-based Q&A.",
+    lifespan=lifespan,
 )
 
 # Allow local frontends / tools to call this API easily
@@ -30,16 +91,121 @@ app.add_middleware(
 )
 
 rag_service = RAGService()
-INDEX_DIR = Path("index_db")
+
+
+def _token_matches(value: Optional[str], token: Optional[str]) -> bool:
+    """
+    Constant-time check of an admin header against a configured token;
+    always False when no token is configured.
+    """
+    if not token or value is None:
+        return False
+    return hmac.compare_digest(value.encode("utf-8"), token.encode("utf-8"))
+
+
+async def profile_request(request: Request, call_next):
+    """
+    Samples a single /query or /documents request when the admin
+    X-Profile header matches PROFILE_TOKEN. Only installed when
+    PROFILING_ENABLED is set, so there is no cost otherwise.
+    """
+    header = request.headers.get("X-Profile")
+    if (
+        not _token_matches(header, settings.PROFILE_TOKEN)
+        or not request.url.path.startswith(("/query", "/documents"))
+    ):
+        return await call_next(request)
+
+    request_id = safe_request_id(request.headers.get("X-Request-ID"))
+    profiler = SamplingProfiler(settings.PROFILE_INTERVAL)
+    token = active_profiler.set(profiler)
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+        active_profiler.reset(token)
+        path = await run_in_threadpool(
+            profiler.save, settings.PROFILE_DIR, request_id
+        )
+        logger.info("Saved profile for request %s to %s", request_id, path)
+
+    response.headers["X-Request-ID"] = request_id
+    response.headers["X-Profile-Samples"] = str(profiler.samples)
+    return response
+
+
+if settings.PROFILING_ENABLED:
+    app.middleware("http")(profile_request)
+INDEX_DIR = settings.INDEX_DIR
 INDEX_DIR.mkdir(exist_ok=True)
-INDEX_PATH = INDEX_DIR / "index.json"
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/health/live")
+async def liveness_check():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    if not rag_service.ready:
+        raise HTTPException(status_code=503, detail="Service is warming up.")
+    return {"status": "ready"}
+
+
+@app.get("/admission")
+async def admission_status():
+    """
+    Per-stage concurrency, queue depth and wait times.
+    """
+    return admission_stats()
+
+
+@app.get("/workers")
+async def worker_status():
+    """
+    Worker count and per-process memory. Under `python -m app.server`
+    model weights are shared, so total_pss_bytes is the real footprint.
+    """
+    return worker_report()
+
+
+def _overloaded(e: AdmissionRejected, action: str) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail=f"{action} failed: {e}",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+# index.lock is shared by every worker process, so these registry updates
+# run in the threadpool rather than blocking the event loop on flock
+def _add_to_index(document_id: str, filename: str) -> None:
+    with index_lock():
+        index = load_index()
+        index.append({"document_id": document_id, "filename": filename})
+        save_index(index)
+
+
+def _rename_in_index(document_id: str, filename: str) -> None:
+    with index_lock():
+        index = load_index()
+        _find_document(index, document_id)["filename"] = filename
+        save_index(index)
+
+
+def _remove_from_index(document_id: str) -> None:
+    with index_lock():
+        save_index([
+            item for item in load_index() if item["document_id"] != document_id
+        ])
+
+
 @app.post("/documents", response_model=IngestResponse)
 async def ingest_document(file: UploadFile = File(...)):
     if file.content_type != "application/pdf":
@@ -59,16 +225,16 @@ async def ingest_document(file: UploadFile = File(...)):
             content = await file.read()
             f.write(content)
 
-        # Ingest into vector store
-        stored_doc_id = rag_service.ingest_document(
-            str(file_path),
-            document_id=doc_id,
-        )
+        # Ingest into vector store (off the event loop; it may queue)
+        with limiters["request"].slot():
+            stored_doc_id = await run_in_threadpool(
+                profiled(rag_service.ingest_document),
+                str(file_path),
+                document_id=doc_id,
+            )
 
         # update index.json with filename + doc_id
-        index = load_index()
-        index.append({"document_id": stored_doc_id, "filename": file.filename})
-        save_index(index)
+        await run_in_threadpool(_add_to_index, stored_doc_id, file.filename)
 
         file_path.unlink(missing_ok=True)
 
@@ -76,12 +242,99 @@ async def ingest_document(file: UploadFile = File(...)):
             document_id=stored_doc_id,
             message="Document ingested successfully.",
         )
+    except AdmissionRejected as e:
+        file_path.unlink(missing_ok=True)
+        raise _overloaded(e, "Ingestion")
+    except EmbeddingModelMismatchError as e:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail=f"Ingestion failed: {e}")
     except Exception as e:
         file_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
 
 
-@app.post("/query", response_model=QueryResponse)
+def _find_document(index: List[dict], document_id: str) -> dict:
+    for item in index:
+        if item["document_id"] == document_id:
+            return item
+    raise HTTPException(
+        status_code=404,
+        detail=f"Document {document_id} not found.",
+    )
+
+
+@app.put("/documents/{document_id}", response_model=UpdateResponse)
+async def update_document(document_id: str, file: UploadFile = File(...)):
+    if file.content_type != "application/pdf":
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "Only PDF files are supported."
+            ),
+        )
+    _find_document(load_index(), document_id)
+
+    file_path = INDEX_DIR / f"{document_id}.{uuid.uuid4()}.pdf"
+    try:
+        with file_path.open("wb") as f:
+            content = await file.read()
+            f.write(content)
+
+        # Only chunks whose content changed are re-embedded
+        with limiters["request"].slot():
+            changes = await run_in_threadpool(
+                profiled(rag_service.update_document),
+                str(file_path),
+                document_id,
+            )
+
+        await run_in_threadpool(_rename_in_index, document_id, file.filename)
+
+        return UpdateResponse(
+            document_id=document_id,
+            message="Document re-indexed successfully.",
+            **changes,
+        )
+    except AdmissionRejected as e:
+        raise _overloaded(e, "Re-index")
+    except EmbeddingModelMismatchError as e:
+        raise HTTPException(status_code=409, detail=f"Re-index failed: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Re-index failed: {e}")
+    finally:
+        file_path.unlink(missing_ok=True)
+
+
+@app.delete("/documents/{document_id}", response_model=DeleteResponse)
+async def delete_document(document_id: str):
+    index = load_index()
+    _find_document(index, document_id)
+
+    try:
+        with limiters["request"].slot():
+            removed = await run_in_threadpool(
+                profiled(rag_service.delete_document),
+                document_id,
+            )
+    except AdmissionRejected as e:
+        raise _overloaded(e, "Deletion")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Deletion failed: {e}")
+
+    await run_in_threadpool(_remove_from_index, document_id)
+
+    return DeleteResponse(
+        document_id=document_id,
+        message="Document deleted successfully.",
+        removed_chunks=removed,
+    )
+
+
+@app.post(
+    "/query",
+    response_model=QueryResponse,
+    response_class=FastJSONResponse,
+)
 async def query_rag(payload: QueryRequest):
     if not payload.question.strip():
         raise HTTPException(
@@ -90,38 +343,87 @@ async def query_rag(payload: QueryRequest):
         )
 
     try:
-        result = rag_service.query(
-            question=payload.question,
-            document_id=payload.document_id,
-            k=payload.top_k,
-        )
-        return QueryResponse(
-            question=result["question"],
-            answer=result["answer"],
-            confidence=result["confidence"],
-            sources=result["sources"],
-            rerankedsources=result["rerankedsources"],
-        )
+        # Rejected here, before a threadpool thread is taken
+        with limiters["request"].slot():
+            result = await run_in_threadpool(
+                profiled(rag_service.query),
+                question=payload.question,
+                document_id=payload.document_id,
+                k=payload.top_k,
+                document_ids=payload.document_ids,
+                response_mode=payload.response_mode,
+                snippet_length=payload.snippet_length,
+            )
+        content = {
+            "question": result["question"],
+            "answer": result["answer"],
+            "confidence": float(result["confidence"]),
+        }
+        # Source lists are omitted entirely for compact response modes
+        for key in ("sources", "rerankedsources"):
+            if key in result:
+                content[key] = result[key]
+        return FastJSONResponse(content)
+    except AdmissionRejected as e:
+        raise _overloaded(e, "Query")
+    except EmbeddingModelMismatchError as e:
+        raise HTTPException(status_code=409, detail=f"Query failed: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
 
-@app.get("/documents/index", response_model=List[DocumentItem])
+@app.get(
+    "/documents/index",
+    response_model=List[DocumentItem],
+    response_class=FastJSONResponse,
+)
 def list_documents():
     index = load_index()
-    return [DocumentItem(**item) for item in index]
+    return FastJSONResponse([
+        {"document_id": item["document_id"], "filename": item["filename"]}
+        for item in index
+    ])
 
 
-def load_index() -> List[dict]:
-    if INDEX_PATH.exists():
-        with INDEX_PATH.open("r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+@app.get("/snapshot")
+async def download_snapshot(request: Request, float16: bool = False):
+    """
+    Streams a checksummed snapshot of the vector store and document
+    registry. Load it on a new node with
+    `python -m app.maintenance snapshot-import <file>`.
+    Admin only: requires the X-Admin-Token header to match ADMIN_TOKEN.
+    """
+    if not _token_matches(
+        request.headers.get("X-Admin-Token"), settings.ADMIN_TOKEN
+    ):
+        raise HTTPException(
+            status_code=403,
+            detail="Snapshot export is not allowed.",
+        )
 
+    fd, tmp_name = tempfile.mkstemp(suffix=".ragsnap", dir=INDEX_DIR)
+    os.close(fd)
+    try:
+        with limiters["snapshot"].slot():
+            await run_in_threadpool(
+                profiled(export_snapshot), rag_service, tmp_name, float16
+            )
+    except AdmissionRejected as e:
+        os.unlink(tmp_name)
+        raise _overloaded(e, "Snapshot")
+    except EmbeddingModelMismatchError as e:
+        os.unlink(tmp_name)
+        raise HTTPException(status_code=409, detail=f"Snapshot failed: {e}")
+    except Exception as e:
+        os.unlink(tmp_name)
+        raise HTTPException(status_code=500, detail=f"Snapshot failed: {e}")
 
-def save_index(entries: List[dict]) -> None:
-    with INDEX_PATH.open("w", encoding="utf-8") as f:
-        json.dump(entries, f, indent=2)
+    return FileResponse(
+        tmp_name,
+        media_type="application/octet-stream",
+        filename="vector_store.ragsnap",
+        background=BackgroundTask(os.unlink, tmp_name),
+    )
 
 
 if __name__ == "__main__":
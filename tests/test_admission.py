@@ -0,0 +1,74 @@
+# tests/test_admission.py
+
+import threading
+
+import pytest
+
+from app.services.admission import AdmissionRejected, StageLimiter
+
+
+# ------------------------------
+#  Test: full queue is rejected with 429
+# ------------------------------
+def test_rejects_when_queue_full():
+    limiter = StageLimiter("rerank", max_concurrency=1, max_queue=0, queue_timeout=1)
+
+    with limiter.slot():
+        with pytest.raises(AdmissionRejected) as exc:
+            with limiter.slot():
+                pass
+
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after >= 1
+    assert limiter.stats()["rejected"] == 1
+
+
+# ------------------------------
+#  Test: queue-time deadline is rejected with 503
+# ------------------------------
+def test_times_out_waiting_for_slot():
+    limiter = StageLimiter("llm", max_concurrency=1, max_queue=1, queue_timeout=0.05)
+
+    with limiter.slot():
+        with pytest.raises(AdmissionRejected) as exc:
+            with limiter.slot():
+                pass
+
+    assert exc.value.status_code == 503
+    stats = limiter.stats()
+    assert stats["timed_out"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+
+
+# ------------------------------
+#  Test: a waiter is admitted when a slot frees up
+# ------------------------------
+def test_waiter_admitted_after_release():
+    limiter = StageLimiter("embedding", max_concurrency=1, max_queue=1, queue_timeout=5)
+    release = threading.Event()
+    admitted = []
+
+    def hold():
+        with limiter.slot():
+            release.wait()
+
+    def wait():
+        with limiter.slot():
+            admitted.append(True)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while limiter.stats()["in_flight"] == 0:
+        pass
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    while limiter.stats()["queue_depth"] == 0:
+        pass
+
+    release.set()
+    holder.join()
+    waiter.join()
+
+    assert admitted == [True]
+    assert limiter.stats()["admitted"] == 2
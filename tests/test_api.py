@@ -1,15 +1,28 @@
 # tests/test_api.py
 
 import io
+import pytest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from pathlib import Path
 
 from main import app
+from app.config import settings
+from app.services import document_registry
+from app.services.embedding_service import EmbeddingModelMismatchError
+from app.services.admission import AdmissionRejected, StageLimiter, limiters
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def registry(tmp_path, monkeypatch):
+    # Keep uploads, index.json and index.lock out of the working tree
+    monkeypatch.setattr(document_registry, "INDEX_PATH", tmp_path / "index.json")
+    monkeypatch.setattr("main.INDEX_DIR", tmp_path)
+    return document_registry
+
+
 # ------------------------------
 #  Test: /health
 # ------------------------------
@@ -59,7 +72,13 @@ def test_upload_invalid_file_type():
 @patch("main.rag_service")
 def test_query_success(mock_rag_service):
     # Mock answer
-    mock_rag_service.query.return_value = "This is a mocked answer."
+    mock_rag_service.query.return_value = {
+        "question": "What is the content?",
+        "answer": "This is a mocked answer.",
+        "confidence": 0.9,
+        "sources": [],
+        "rerankedsources": [],
+    }
 
     payload = {
         "question": "What is the content?",
@@ -73,6 +92,51 @@ def test_query_success(mock_rag_service):
     assert response.json()["answer"] == "This is a mocked answer."
 
 
+# ------------------------------
+#  Test: /query (multiple documents)
+# ------------------------------
+@patch("main.rag_service")
+def test_query_multiple_documents(mock_rag_service):
+    mock_rag_service.query.return_value = {
+        "question": "Compare them",
+        "answer": "Both agree.",
+        "confidence": 0.8,
+        "sources": [
+            {"document_id": "doc1", "page": 0, "snippet": "a"},
+            {"document_id": "doc2", "page": 3, "snippet": "b"},
+        ],
+        "rerankedsources": [],
+    }
+
+    payload = {"question": "Compare them", "document_ids": ["doc1", "doc2"]}
+
+    response = client.post("/query", json=payload)
+
+    assert response.status_code == 200
+    assert mock_rag_service.query.call_args.kwargs["document_ids"] == [
+        "doc1",
+        "doc2",
+    ]
+    sources = response.json()["sources"]
+    assert [s["document_id"] for s in sources] == ["doc1", "doc2"]
+
+
+# ------------------------------
+#  Test: /query (too many documents)
+# ------------------------------
+@patch("main.rag_service")
+def test_query_too_many_documents(mock_rag_service):
+    payload = {
+        "question": "Compare them",
+        "document_ids": [f"doc{i}" for i in range(settings.MAX_QUERY_DOCUMENTS + 1)],
+    }
+
+    response = client.post("/query", json=payload)
+
+    assert response.status_code == 422
+    mock_rag_service.query.assert_not_called()
+
+
 # ------------------------------
 #  Test: /query (empty question)
 # ------------------------------
@@ -87,3 +151,207 @@ def test_query_empty_question():
 
     assert response.status_code == 400
     assert "Question must not be empty." in response.json()["detail"]
+
+
+# ------------------------------
+#  Test: /query (embedding model mismatch)
+# ------------------------------
+@patch("main.rag_service")
+def test_query_embedding_model_mismatch(mock_rag_service):
+    mock_rag_service.query.side_effect = EmbeddingModelMismatchError(
+        "Vector store was built with embedding model 'openai:a'"
+    )
+
+    payload = {"question": "What is the content?", "document_id": "doc123"}
+
+    response = client.post("/query", json=payload)
+
+    assert response.status_code == 409
+    assert "openai:a" in response.json()["detail"]
+
+
+# ------------------------------
+#  Test: /query (stage saturated)
+# ------------------------------
+@patch("main.rag_service")
+def test_query_rejected_when_saturated(mock_rag_service):
+    mock_rag_service.query.side_effect = AdmissionRejected(
+        "llm", 429, 3, "queue is full"
+    )
+
+    response = client.post("/query", json={"question": "Anything?"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert "llm stage queue is full" in response.json()["detail"]
+
+
+# ------------------------------
+#  Test: /query (request gate full, rejected before the threadpool)
+# ------------------------------
+@patch("main.rag_service")
+def test_query_rejected_at_request_gate(mock_rag_service):
+    gate = StageLimiter("request", max_concurrency=1, max_queue=0, queue_timeout=1)
+
+    with patch.dict(limiters, {"request": gate}), gate.slot():
+        response = client.post("/query", json={"question": "Anything?"})
+
+    assert response.status_code == 429
+    assert "request stage queue is full" in response.json()["detail"]
+    mock_rag_service.query.assert_not_called()
+    assert client.get("/health/live").status_code == 200
+
+
+# ------------------------------
+#  Test: /health/live and /health/ready
+# ------------------------------
+@patch("main.rag_service")
+def test_liveness_and_readiness(mock_rag_service):
+    mock_rag_service.ready = False
+
+    assert client.get("/health/live").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+
+    mock_rag_service.ready = True
+
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready"}
+
+
+# ------------------------------
+#  Test: /query (answer-only response)
+# ------------------------------
+@patch("main.rag_service")
+def test_query_answer_only(mock_rag_service):
+    mock_rag_service.query.return_value = {
+        "question": "What is the content?",
+        "answer": "Short.",
+        "confidence": 1,
+    }
+
+    payload = {
+        "question": "What is the content?",
+        "response_mode": "answer",
+        "snippet_length": 80,
+    }
+
+    response = client.post("/query", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "question": "What is the content?",
+        "answer": "Short.",
+        "confidence": 1.0,
+    }
+    kwargs = mock_rag_service.query.call_args.kwargs
+    assert kwargs["response_mode"] == "answer"
+    assert kwargs["snippet_length"] == 80
+
+
+# ------------------------------
+#  Test: /query (invalid response mode)
+# ------------------------------
+def test_query_invalid_response_mode():
+    payload = {"question": "What is the content?", "response_mode": "verbose"}
+
+    response = client.post("/query", json=payload)
+
+    assert response.status_code == 422
+
+
+# ------------------------------
+#  Test: DELETE /documents/{id}
+# ------------------------------
+@patch("main.save_index")
+@patch("main.load_index")
+@patch("main.rag_service")
+def test_delete_document(mock_rag_service, mock_load_index, mock_save_index):
+    mock_load_index.return_value = [
+        {"document_id": "doc1", "filename": "a.pdf"},
+        {"document_id": "doc2", "filename": "b.pdf"},
+    ]
+    mock_rag_service.delete_document.return_value = 12
+
+    response = client.delete("/documents/doc1")
+
+    assert response.status_code == 200
+    assert response.json()["removed_chunks"] == 12
+    mock_rag_service.delete_document.assert_called_once_with("doc1")
+    mock_save_index.assert_called_once_with(
+        [{"document_id": "doc2", "filename": "b.pdf"}]
+    )
+
+
+# ------------------------------
+#  Test: DELETE /documents/{id} (unknown document)
+# ------------------------------
+@patch("main.load_index", return_value=[])
+@patch("main.rag_service")
+def test_delete_unknown_document(mock_rag_service, mock_load_index):
+    response = client.delete("/documents/missing")
+
+    assert response.status_code == 404
+    mock_rag_service.delete_document.assert_not_called()
+
+
+# ------------------------------
+#  Test: PUT /documents/{id}
+# ------------------------------
+@patch("main.save_index")
+@patch("main.load_index")
+@patch("main.rag_service")
+def test_update_document(mock_rag_service, mock_load_index, mock_save_index):
+    mock_load_index.return_value = [{"document_id": "doc1", "filename": "a.pdf"}]
+    mock_rag_service.update_document.return_value = {
+        "added": 2,
+        "removed": 1,
+        "unchanged": 40,
+    }
+
+    fake_pdf = io.BytesIO(b"%PDF-1.4 Fake PDF content")
+    files = {"file": ("a-v2.pdf", fake_pdf, "application/pdf")}
+
+    response = client.put("/documents/doc1", files=files)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["added"], result["removed"], result["unchanged"]) == (2, 1, 40)
+    mock_save_index.assert_called_once_with(
+        [{"document_id": "doc1", "filename": "a-v2.pdf"}]
+    )
+
+
+# ------------------------------
+#  Test: /workers
+# ------------------------------
+def test_worker_status():
+    response = client.get("/workers")
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["workers"] == 1
+    assert result["processes"][0]["pid"] == result["pid"]
+    assert result["processes"][0]["rss_bytes"] > 0
+
+
+# ------------------------------
+#  Test: GET /snapshot requires the admin token
+# ------------------------------
+@patch("main.export_snapshot")
+@patch("main.settings")
+def test_snapshot_requires_admin_token(mock_settings, mock_export):
+    mock_settings.ADMIN_TOKEN = None
+    assert client.get("/snapshot").status_code == 403
+
+    mock_settings.ADMIN_TOKEN = "secret"
+    response = client.get("/snapshot", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+    mock_export.assert_not_called()
+
+    mock_export.side_effect = (
+        lambda service, path, float16: Path(path).write_bytes(b"RAGSNAP")
+    )
+    response = client.get("/snapshot", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.content == b"RAGSNAP"
@@ -0,0 +1,37 @@
+# tests/test_document_registry.py
+
+import multiprocessing
+
+from app.services import document_registry
+
+
+def _append_entries(index_path, worker, count):
+    document_registry.INDEX_PATH = index_path
+    for i in range(count):
+        with document_registry.index_lock():
+            index = document_registry.load_index()
+            index.append({"document_id": f"{worker}-{i}", "filename": "a.pdf"})
+            document_registry.save_index(index)
+
+
+# ------------------------------
+#  Test: registry updates from several processes
+# ------------------------------
+def test_concurrent_writers_keep_every_entry(tmp_path, monkeypatch):
+    index_path = tmp_path / "index.json"
+    monkeypatch.setattr(document_registry, "INDEX_PATH", index_path)
+
+    ctx = multiprocessing.get_context("fork")
+    processes = [
+        ctx.Process(target=_append_entries, args=(index_path, w, 25))
+        for w in range(4)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    index = document_registry.load_index()
+    assert len(index) == 100
+    assert len({item["document_id"] for item in index}) == 100
+    assert not list(tmp_path.glob("*.tmp"))
@@ -0,0 +1,31 @@
+# tests/test_embedding_service.py
+
+import numpy as np
+
+from app.services.embedding_service import LocalEmbeddings
+
+
+class FakeSentenceTransformer:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, sentences, **kwargs):
+        self.calls.append(sentences)
+        if isinstance(sentences, str):
+            return np.array([len(sentences), 1.0])
+        return np.array([[len(s), 1.0] for s in sentences])
+
+
+# ------------------------------
+#  Test: length-sorted batching keeps the caller's order
+# ------------------------------
+def test_embed_documents_preserves_order():
+    embeddings = LocalEmbeddings("fake-model")
+    embeddings._model = FakeSentenceTransformer()
+
+    texts = ["ccc", "a", "bb"]
+    vectors = embeddings.embed_documents(texts)
+
+    assert embeddings._model.calls[0] == ["a", "bb", "ccc"]
+    assert [v[0] for v in vectors] == [3.0, 1.0, 2.0]
+    assert embeddings.embed_query("dddd") == [4.0, 1.0]
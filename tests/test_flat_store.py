@@ -0,0 +1,123 @@
+# tests/test_flat_store.py
+
+from pathlib import Path
+
+import numpy as np
+
+from app.services.flat_store import FlatVectorStore
+
+
+def _add(store, doc_id, vectors):
+    store.add(
+        doc_id,
+        [f"{doc_id}-{i}" for i in range(len(vectors))],
+        [{"document_id": doc_id, "page": i} for i in range(len(vectors))],
+        vectors,
+    )
+
+
+# ------------------------------
+#  Test: search scoped to one document
+# ------------------------------
+def test_search_by_document(tmp_path):
+    store = FlatVectorStore(tmp_path)
+    _add(store, "a", [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]])
+    _add(store, "b", [[1.0, 0.0]])
+
+    results = store.search([1.0, 0.1], k=2, document_id="a")
+
+    assert [doc.page_content for doc, _ in results] == ["a-0", "a-2"]
+    assert results[0][0].metadata == {"document_id": "a", "page": 0}
+    assert results[0][1] >= results[1][1]
+
+
+# ------------------------------
+#  Test: unscoped search and reopening from disk
+# ------------------------------
+def test_search_all_documents_after_reopen(tmp_path):
+    _add(FlatVectorStore(tmp_path), "a", [[0.0, 1.0], [0.6, 0.8]])
+    _add(FlatVectorStore(tmp_path), "b", [[1.0, 0.0]])
+
+    store = FlatVectorStore(tmp_path)
+    results = store.search([1.0, 0.0], k=10)
+
+    assert [doc.page_content for doc, _ in results] == ["b-0", "a-1", "a-0"]
+    assert np.isclose(results[0][1], 1.0)
+    assert store.search([1.0, 0.0], document_id="missing") == []
+
+
+# ------------------------------
+#  Test: replace, delete and compaction
+# ------------------------------
+def test_replace_delete_and_compact(tmp_path):
+    store = FlatVectorStore(tmp_path)
+    _add(store, "a", [[1.0, 0.0], [0.0, 1.0]])
+    _add(store, "b", [[0.6, 0.8]])
+    store.add("a", ["a-new"], [{"document_id": "a"}], [[1.0, 0.0]], replace=True)
+
+    assert [doc.page_content for doc, _ in store.search([1.0, 0.0], k=10)] == [
+        "a-new",
+        "b-0",
+    ]
+    assert store.delete("b") == 1
+    assert store.stats() == {"documents": 1, "rows": 4, "dead_rows": 3}
+
+    report = store.compact()
+
+    assert (report["rows_before"], report["rows_after"]) == (4, 1)
+    assert report["bytes_after"] < report["bytes_before"]
+    assert store.stats() == {"documents": 1, "rows": 1, "dead_rows": 0}
+    assert [doc.page_content for doc, _ in store.search([1.0, 0.0])] == ["a-new"]
+    (record, vector), = store.get_document("a")
+    assert record["text"] == "a-new" and np.allclose(vector, [1.0, 0.0])
+
+
+# ------------------------------
+#  Test: compaction while a search holds the previous generation
+# ------------------------------
+def test_search_survives_concurrent_compaction(tmp_path):
+    _add(FlatVectorStore(tmp_path), "a", [[1.0, 0.0], [0.0, 1.0]])
+    writer = FlatVectorStore(tmp_path)
+    writer.delete("a")
+    _add(writer, "b", [[0.6, 0.8]])
+
+    reader = FlatVectorStore(tmp_path)
+    open_generation = reader._open_generation
+
+    def open_then_compact():
+        generation = open_generation()
+        writer.compact()
+        return generation
+
+    reader._open_generation = open_then_compact
+    results = reader.search([1.0, 0.0], k=10)
+
+    assert [doc.page_content for doc, _ in results] == ["b-0"]
+    assert not (tmp_path / "chunks.jsonl").exists()
+
+
+# ------------------------------
+#  Test: files that cannot be deleted yet are removed on the next write
+# ------------------------------
+def test_compact_defers_locked_files(tmp_path, monkeypatch):
+    store = FlatVectorStore(tmp_path)
+    _add(store, "a", [[1.0, 0.0], [0.0, 1.0]])
+    store.delete("a")
+    _add(store, "b", [[0.6, 0.8]])
+
+    # Windows raises PermissionError when deleting a file still mapped
+    unlink = Path.unlink
+
+    def locked_unlink(path, *args, **kwargs):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(Path, "unlink", locked_unlink)
+    store.compact()
+    assert (tmp_path / "chunks.jsonl").exists()
+
+    monkeypatch.setattr(Path, "unlink", unlink)
+    _add(store, "c", [[1.0, 0.0]])
+
+    assert sorted(p.name for p in tmp_path.glob("*.f32")) == ["embeddings.1.f32"]
+    assert not (tmp_path / "chunks.jsonl").exists()
+    assert [doc.page_content for doc, _ in store.search([1.0, 0.0], k=1)] == ["c-0"]
@@ -0,0 +1,75 @@
+# tests/test_profiling.py
+
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+
+from main import profile_request
+from app.services.profiling import profiled, safe_request_id
+
+
+def slow_pipeline_step():
+    end = time.monotonic() + 0.1
+    while time.monotonic() < end:
+        pass
+    return {"answer": "ok"}
+
+
+profiled_app = FastAPI()
+profiled_app.middleware("http")(profile_request)
+
+
+@profiled_app.post("/query")
+async def fake_query():
+    return await run_in_threadpool(profiled(slow_pipeline_step))
+
+
+client = TestClient(profiled_app)
+
+
+# ------------------------------
+#  Test: profile saved for an admin request
+# ------------------------------
+def test_profile_saved_with_request_id(tmp_path):
+    with patch("main.settings") as mock_settings:
+        mock_settings.PROFILE_TOKEN = "secret"
+        mock_settings.PROFILE_DIR = tmp_path
+        mock_settings.PROFILE_INTERVAL = 0.001
+
+        response = client.post(
+            "/query",
+            headers={"X-Profile": "secret", "X-Request-ID": "req-42"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "req-42"
+    collapsed = (tmp_path / "req-42.collapsed").read_text()
+    assert "slow_pipeline_step" in collapsed
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+# ------------------------------
+#  Test: no profile without the admin token
+# ------------------------------
+def test_profile_skipped_without_token(tmp_path):
+    with patch("main.settings") as mock_settings:
+        mock_settings.PROFILE_TOKEN = "secret"
+        mock_settings.PROFILE_DIR = tmp_path
+
+        response = client.post("/query", headers={"X-Profile": "wrong"})
+
+    assert response.status_code == 200
+    assert "X-Profile-Samples" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+# ------------------------------
+#  Test: request ids cannot escape PROFILE_DIR
+# ------------------------------
+def test_safe_request_id_rejects_paths():
+    assert safe_request_id("abc-123") == "abc-123"
+    assert "/" not in safe_request_id("../../etc/passwd")
@@ -0,0 +1,180 @@
+# tests/test_rag_basic.py
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from chromadb.errors import NotFoundError
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from app.services.profiling import active_profiler
+from app.services.rag_service import RAGService, _recover_compaction
+
+
+def _make_service(candidates):
+    """
+    RAGService without embedding/LLM clients; retrieval returns
+    the given (text, score) pairs per document.
+    """
+    service = RAGService.__new__(RAGService)
+    service._retrieval_pool = ThreadPoolExecutor(max_workers=4)
+    service._embed_query = lambda question: [1.0, 0.0]
+    service._retrieve = lambda embedding, doc_id, k=100: [
+        (Document(page_content=text, metadata={"document_id": doc_id}), score)
+        for text, score in candidates[doc_id]
+    ][:k]
+    service.llm = RunnableLambda(
+        lambda _: json.dumps({"answer": "merged", "confidence": 0.7})
+    )
+    return service
+
+
+# ------------------------------
+#  Test: fan-out retrieval merges into one rerank batch
+# ------------------------------
+@patch("app.services.rag_service.get_reranker")
+def test_query_fans_out_across_documents(mock_get_reranker):
+    service = _make_service({
+        "doc1": [("one-a", 0.9), ("one-b", 0.2)],
+        "doc2": [("two-a", 0.5)],
+    })
+    reranker = mock_get_reranker.return_value
+    reranker.predict.side_effect = lambda pairs: [
+        {"one-a": 0.1, "two-a": 0.9, "one-b": 0.5}[text] for _, text in pairs
+    ]
+
+    result = service.query("q", k=2, document_ids=["doc1", "doc2"])
+
+    # One rerank call over the merged candidates, best vector score first
+    reranker.predict.assert_called_once()
+    assert [s["snippet"] for s in result["sources"]] == [
+        "one-a",
+        "two-a",
+        "one-b",
+    ]
+    assert [s["document_id"] for s in result["rerankedsources"]] == [
+        "doc2",
+        "doc1",
+    ]
+    assert result["answer"] == "merged"
+
+
+# ------------------------------
+#  Test: response modes and snippet length
+# ------------------------------
+@patch("app.services.rag_service.get_reranker")
+def test_query_response_modes(mock_get_reranker):
+    service = _make_service({"doc1": [("abcdef", 0.9), ("ghijkl", 0.1)]})
+    mock_get_reranker.return_value.predict.side_effect = (
+        lambda pairs: [1.0] * len(pairs)
+    )
+
+    full = service.query("q", document_id="doc1", k=1, snippet_length=3)
+    reranked = service.query("q", document_id="doc1", response_mode="reranked")
+    answer = service.query("q", document_id="doc1", response_mode="answer")
+
+    assert [s["snippet"] for s in full["sources"]] == ["abc", "ghi"]
+    assert len(full["rerankedsources"]) == 1
+    assert "sources" not in reranked and len(reranked["rerankedsources"]) == 2
+    assert set(answer) == {"question", "answer", "confidence"}
+
+
+class _FakeCollection:
+    def __init__(self, client, name, count=0, metadata=None):
+        self.client, self.name = client, name
+        self.id = f"id-{name}"
+        self.metadata = metadata or {}
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def modify(self, name):
+        del self.client.collections[self.name]
+        self.client.collections[name] = self
+        self.name = name
+
+
+class _FakeClient:
+    def __init__(self, *collections):
+        self.collections = {}
+        for name, count, metadata in collections:
+            self.collections[name] = _FakeCollection(self, name, count, metadata)
+
+    def get_collection(self, name):
+        if name not in self.collections:
+            raise NotFoundError(name)
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+    def counts(self):
+        return {name: c.count() for name, c in self.collections.items()}
+
+
+# ------------------------------
+#  Test: recovery from an interrupted Chroma compaction
+# ------------------------------
+def test_recover_compaction():
+    # Crashed after the old collection was renamed aside: roll back
+    client = _FakeClient(
+        ("langchain-replaced", 50, None), ("langchain-compacting", 50, None)
+    )
+    _recover_compaction(client)
+    assert client.counts() == {"langchain": 50}
+
+    # Crashed after the tagged copy took the name: finish the swap
+    client = _FakeClient(("langchain-replaced", 50, None))
+    client.collections["langchain"] = _FakeCollection(
+        client, "langchain", 50, {"compacted_from": "id-langchain-replaced"}
+    )
+    _recover_compaction(client)
+    assert client.counts() == {"langchain": 50}
+
+    # An empty collection took the name during the swap: keep the data
+    client = _FakeClient(
+        ("langchain-replaced", 50, None),
+        ("langchain-compacting", 50, None),
+        ("langchain", 0, None),
+    )
+    _recover_compaction(client)
+    assert client.counts() == {"langchain": 50}
+
+    # Two untagged collections with data: never guess
+    client = _FakeClient(("langchain-replaced", 50, None), ("langchain", 3, None))
+    with pytest.raises(RuntimeError):
+        _recover_compaction(client)
+    assert client.counts() == {"langchain-replaced": 50, "langchain": 3}
+
+
+class _ThreadRecorder:
+    def __init__(self):
+        self.threads = set()
+
+    def add_thread(self, ident):
+        self.threads.add(ident)
+
+    def remove_thread(self, ident):
+        pass
+
+
+# ------------------------------
+#  Test: fan-out searches are registered with the request profiler
+# ------------------------------
+def test_fanout_threads_are_profiled():
+    service = _make_service({"doc1": [("a", 0.9)], "doc2": [("b", 0.5)]})
+    recorder = _ThreadRecorder()
+
+    token = active_profiler.set(recorder)
+    try:
+        docs = service._retrieve_many([1.0, 0.0], ["doc1", "doc2"])
+    finally:
+        active_profiler.reset(token)
+
+    assert [d.page_content for d in docs] == ["a", "b"]
+    assert recorder.threads
+    assert threading.get_ident() not in recorder.threads
@@ -0,0 +1,18 @@
+# tests/test_server.py
+
+from unittest.mock import patch
+
+from app.server import _worker_count
+
+
+# ------------------------------
+#  Test: several workers only with the flat backend
+# ------------------------------
+@patch("app.server.settings")
+def test_worker_count_by_backend(mock_settings):
+    mock_settings.VECTOR_STORE_BACKEND = "chroma"
+    assert _worker_count(4) == 1
+
+    mock_settings.VECTOR_STORE_BACKEND = "flat"
+    assert _worker_count(4) == 4
+    assert _worker_count(0) == 1
@@ -0,0 +1,90 @@
+# tests/test_snapshot.py
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.services import document_registry
+from app.services.embedding_service import EmbeddingModelMismatchError
+from app.services.rag_service import RAGService
+from app.services.snapshot import SnapshotError, export_snapshot, import_snapshot
+
+
+def _flat_service(path):
+    service = RAGService(path)
+    service.vector_backend = "flat"
+    service.embedding_model = DeterministicFakeEmbedding(size=8)
+    return service
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_registry, "INDEX_PATH", tmp_path / "index.json")
+    return document_registry
+
+
+# ------------------------------
+#  Test: export then import into a fresh store
+# ------------------------------
+@pytest.mark.parametrize("float16", [False, True])
+def test_snapshot_round_trip(tmp_path, registry, float16):
+    source = _flat_service(tmp_path / "source")
+    texts = [f"chunk {i}" for i in range(30)]
+    source.flat_store.add(
+        "doc1",
+        texts,
+        [{"document_id": "doc1", "chunk_id": f"doc1:{i}"} for i in range(30)],
+        source.embedding_model.embed_documents(texts),
+        embedding_model=source.embedding_model_id,
+    )
+    registry.save_index([{"document_id": "doc1", "filename": "a.pdf"}])
+
+    header = export_snapshot(source, tmp_path / "store.ragsnap", float16=float16)
+    assert header["count"] == 30
+    assert header["dtype"] == ("float16" if float16 else "float32")
+
+    registry.save_index([])
+    replica = _flat_service(tmp_path / "replica")
+    report = import_snapshot(replica, tmp_path / "store.ragsnap", batch_size=7)
+
+    assert report["loaded"] == 30
+    assert registry.load_index() == [{"document_id": "doc1", "filename": "a.pdf"}]
+    query = replica._embed_query("chunk 3")
+    best, _ = replica._retrieve(query, "doc1", k=1)[0]
+    assert best.page_content == "chunk 3"
+
+
+# ------------------------------
+#  Test: corrupted snapshot is rejected
+# ------------------------------
+def test_snapshot_checksum_mismatch(tmp_path, registry):
+    source = _flat_service(tmp_path / "source")
+    source.flat_store.add(
+        "doc1", ["only"], [{"document_id": "doc1"}], [[1.0] * 8]
+    )
+    path = tmp_path / "store.ragsnap"
+    export_snapshot(source, path)
+
+    data = bytearray(path.read_bytes())
+    data[-5] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError, match="checksum"):
+        import_snapshot(_flat_service(tmp_path / "replica"), path)
+
+
+# ------------------------------
+#  Test: export refuses a store built with another embedding model
+# ------------------------------
+def test_snapshot_export_embedding_model_mismatch(tmp_path, registry):
+    source = _flat_service(tmp_path / "source")
+    source.flat_store.add(
+        "doc1",
+        ["only"],
+        [{"document_id": "doc1"}],
+        [[1.0] * 8],
+        embedding_model="local:other-model",
+    )
+
+    with pytest.raises(EmbeddingModelMismatchError, match="local:other-model"):
+        export_snapshot(source, tmp_path / "store.ragsnap")
+    assert not (tmp_path / "store.ragsnap").exists()